@@ -0,0 +1,301 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+"""
+Message size and topology aware algorithm selection for all_reduce, all_gather_into_tensor
+and reduce_scatter_tensor on the world group.
+
+Available algorithms:
+ - direct: the torch.distributed collective
+ - ring: ring reduce-scatter and/or all-gather built from point-to-point send/recv
+ - hierarchical: two-level collective, within each node and then across nodes
+ - coalesced: the message is issued as a batch of asynchronous collectives, chunks of
+   chunk_bytes for all_reduce and reduce_scatter_tensor, and a list based all_gather
+   writing directly into the per-rank slices of the output for all_gather_into_tensor
+
+Each (op, message size bucket) is benchmarked once at init, or loaded from a cached profile,
+and every rank uses the algorithm with the lowest max-over-ranks latency.
+"""
+
+import bisect
+import json
+import os
+import time
+
+import torch
+
+from deepspeed import utils
+from deepspeed.accelerator import get_accelerator
+from .constants import *
+
+ALGORITHMS = ['direct', 'ring', 'hierarchical', 'coalesced']
+SELECTED_OPS = ['all_reduce', 'all_gather_into_tensor', 'reduce_scatter_tensor']
+
+
+def _combine(dst, src, op):
+    """In-place ``dst = op(dst, src)``, AVG is divided by the caller once all ranks are summed."""
+    if op == torch.distributed.ReduceOp.SUM or op == torch.distributed.ReduceOp.AVG:
+        dst.add_(src)
+    elif op == torch.distributed.ReduceOp.PRODUCT:
+        dst.mul_(src)
+    elif op == torch.distributed.ReduceOp.MIN:
+        torch.minimum(dst, src, out=dst)
+    elif op == torch.distributed.ReduceOp.MAX:
+        torch.maximum(dst, src, out=dst)
+
+
+def _is_supported_op(op):
+    return op in [
+        torch.distributed.ReduceOp.SUM, torch.distributed.ReduceOp.AVG, torch.distributed.ReduceOp.PRODUCT,
+        torch.distributed.ReduceOp.MIN, torch.distributed.ReduceOp.MAX
+    ]
+
+
+class CollectiveAlgorithmSelector(object):
+
+    def __init__(self,
+                 ranks_per_node=None,
+                 algorithms=ALGORITHMS,
+                 min_bytes=COMMS_ALGO_SELECTION_MIN_BYTES_DEFAULT,
+                 max_bytes=COMMS_ALGO_SELECTION_MAX_BYTES_DEFAULT,
+                 iters=COMMS_ALGO_SELECTION_ITERS_DEFAULT,
+                 chunk_bytes=COMMS_ALGO_SELECTION_CHUNK_BYTES_DEFAULT,
+                 profile_path=None):
+        self.rank = torch.distributed.get_rank()
+        self.world_size = torch.distributed.get_world_size()
+        self.backend = torch.distributed.get_backend()
+        self.ranks_per_node = ranks_per_node or self._get_local_size()
+        self.chunk_bytes = chunk_bytes
+        self.iters = iters
+        self.device = torch.device(
+            'cpu' if self.backend == GLOO_BACKEND else get_accelerator().current_device_name())
+
+        self.bucket_bytes = []
+        size = min_bytes
+        while size < max_bytes:
+            self.bucket_bytes.append(size)
+            size *= 4
+        self.bucket_bytes.append(max_bytes)
+
+        self.algorithms = [algo for algo in algorithms if algo in ALGORITHMS]
+        if self.world_size % self.ranks_per_node != 0 or self.ranks_per_node in [1, self.world_size]:
+            # a single level topology has nothing to gain from the hierarchical algorithms
+            self.algorithms = [algo for algo in self.algorithms if algo != 'hierarchical']
+        else:
+            self._init_node_groups()
+        if 'direct' not in self.algorithms:
+            self.algorithms.insert(0, 'direct')
+
+        self.table = self._load_profile(profile_path)
+        if self.table is None:
+            self.table, times = self._benchmark()
+            if profile_path is not None and self.rank == 0:
+                self._save_profile(profile_path, times)
+        utils.logger.info(f'Collective algorithm selection (rank {self.rank}): {self.table}')
+
+    def _get_local_size(self):
+        for var in ['LOCAL_SIZE', 'LOCAL_WORLD_SIZE', 'OMPI_COMM_WORLD_LOCAL_SIZE']:
+            if var in os.environ:
+                return int(os.environ[var])
+        return self.world_size
+
+    def _init_node_groups(self):
+        self.num_nodes = self.world_size // self.ranks_per_node
+        self.node = self.rank // self.ranks_per_node
+        self.local_rank = self.rank % self.ranks_per_node
+        self.intra_node_ranks = [self.node * self.ranks_per_node + i for i in range(self.ranks_per_node)]
+        self.inter_node_ranks = [i * self.ranks_per_node + self.local_rank for i in range(self.num_nodes)]
+        # every rank has to take part in the creation of every group
+        for node in range(self.num_nodes):
+            group = torch.distributed.new_group([node * self.ranks_per_node + i for i in range(self.ranks_per_node)])
+            if node == self.node:
+                self.intra_node_group = group
+        for local_rank in range(self.ranks_per_node):
+            group = torch.distributed.new_group([i * self.ranks_per_node + local_rank for i in range(self.num_nodes)])
+            if local_rank == self.local_rank:
+                self.inter_node_group = group
+
+    def _profile_key(self):
+        return {
+            'backend': self.backend,
+            'world_size': self.world_size,
+            'ranks_per_node': self.ranks_per_node,
+            'device': self.device.type,
+            'algorithms': self.algorithms,
+            'bucket_bytes': self.bucket_bytes,
+            'chunk_bytes': self.chunk_bytes
+        }
+
+    def _load_profile(self, profile_path):
+        table = None
+        if profile_path is not None and os.path.isfile(profile_path):
+            with open(profile_path, 'r') as f:
+                profile = json.load(f)
+            if profile.get('key') == self._profile_key():
+                table = profile['table']
+        # all ranks have to agree on the table, benchmark again unless every rank loaded it
+        loaded = torch.tensor([1 if table is not None else 0], dtype=torch.int32, device=self.device)
+        torch.distributed.all_reduce(loaded, op=torch.distributed.ReduceOp.MIN)
+        return table if loaded.item() == 1 else None
+
+    def _save_profile(self, profile_path, times):
+        with open(profile_path, 'w') as f:
+            json.dump({'key': self._profile_key(), 'table': self.table, 'times_ms': times}, f, indent=2)
+
+    def _make_buffers(self, op_name, nbytes):
+        numel = max(nbytes // 4 // self.world_size, 1)
+        full = torch.ones(numel * self.world_size, dtype=torch.float32, device=self.device)
+        part = torch.ones(numel, dtype=torch.float32, device=self.device)
+        if op_name == 'all_reduce':
+            return (full, torch.distributed.ReduceOp.SUM)
+        if op_name == 'all_gather_into_tensor':
+            return (full, part)
+        return (part, full, torch.distributed.ReduceOp.SUM)
+
+    def _time(self, op_name, algo, args):
+        fn = getattr(self, op_name)
+        try:
+            fn(*args, algo=algo)
+        except RuntimeError:
+            # not implemented by the backend, e.g. all_gather_into_tensor with gloo
+            return float('inf')
+        self._synchronize()
+        start = time.time()
+        for _ in range(self.iters):
+            fn(*args, algo=algo)
+        self._synchronize()
+        return (time.time() - start) * 1000 / self.iters
+
+    def _synchronize(self):
+        if self.device.type != 'cpu':
+            get_accelerator().synchronize()
+
+    def _benchmark(self):
+        times = torch.zeros(len(SELECTED_OPS), len(self.bucket_bytes), len(self.algorithms), dtype=torch.float64)
+        for i, op_name in enumerate(SELECTED_OPS):
+            for j, nbytes in enumerate(self.bucket_bytes):
+                args = self._make_buffers(op_name, nbytes)
+                for k, algo in enumerate(self.algorithms):
+                    times[i, j, k] = self._time(op_name, algo, args)
+        times = times.to(self.device)
+        torch.distributed.all_reduce(times, op=torch.distributed.ReduceOp.MAX)
+        times = times.cpu()
+        table = {
+            op_name: [self.algorithms[k] for k in times[i].argmin(dim=1).tolist()]
+            for i, op_name in enumerate(SELECTED_OPS)
+        }
+        return table, {op_name: times[i].tolist() for i, op_name in enumerate(SELECTED_OPS)}
+
+    def select(self, op_name, nbytes):
+        bucket = min(bisect.bisect_left(self.bucket_bytes, nbytes), len(self.bucket_bytes) - 1)
+        return self.table[op_name][bucket]
+
+    def _ring_exchange(self, ranks, pos, send, recv):
+        n = len(ranks)
+        ops = [
+            torch.distributed.P2POp(torch.distributed.isend, send, ranks[(pos + 1) % n]),
+            torch.distributed.P2POp(torch.distributed.irecv, recv, ranks[(pos - 1) % n])
+        ]
+        for req in torch.distributed.batch_isend_irecv(ops):
+            req.wait()
+
+    def _ring_reduce_scatter(self, chunks, ranks, pos, op):
+        """Leaves chunks[pos] reduced over ``ranks``, the other chunks are partially reduced."""
+        n = len(ranks)
+        buffers = {}
+        for step in range(n - 1):
+            send_chunk = chunks[(pos - step - 1) % n]
+            recv_chunk = chunks[(pos - step - 2) % n]
+            recv = buffers.get(recv_chunk.numel())
+            if recv is None:
+                recv = buffers[recv_chunk.numel()] = torch.empty_like(recv_chunk)
+            self._ring_exchange(ranks, pos, send_chunk, recv)
+            _combine(recv_chunk, recv, op)
+
+    def _ring_all_gather(self, chunks, ranks, pos):
+        """Fills all chunks from chunks[pos] of each rank of ``ranks``."""
+        n = len(ranks)
+        for step in range(n - 1):
+            self._ring_exchange(ranks, pos, chunks[(pos - step) % n], chunks[(pos - step - 1) % n])
+
+    def _chunks(self, tensor):
+        return tensor.split(max(self.chunk_bytes // tensor.element_size(), 1))
+
+    def all_reduce(self, tensor, op, algo):
+        if algo == 'direct':
+            return torch.distributed.all_reduce(tensor, op=op)
+        # AVG is summed and divided at the end, not all backends implement it
+        reduce_op = torch.distributed.ReduceOp.SUM if op == torch.distributed.ReduceOp.AVG else op
+        flat = tensor.view(-1)
+        if algo == 'ring':
+            ranks = list(range(self.world_size))
+            chunks = list(flat.tensor_split(self.world_size))
+            self._ring_reduce_scatter(chunks, ranks, self.rank, reduce_op)
+            self._ring_all_gather(chunks, ranks, self.rank)
+        elif algo == 'hierarchical':
+            leader = self.intra_node_ranks[0]
+            torch.distributed.reduce(flat, dst=leader, op=reduce_op, group=self.intra_node_group)
+            if self.local_rank == 0:
+                torch.distributed.all_reduce(flat, op=reduce_op, group=self.inter_node_group)
+            torch.distributed.broadcast(flat, src=leader, group=self.intra_node_group)
+        else:
+            handles = [
+                torch.distributed.all_reduce(chunk, op=reduce_op, async_op=True) for chunk in self._chunks(flat)
+            ]
+            for handle in handles:
+                handle.wait()
+        if op == torch.distributed.ReduceOp.AVG:
+            flat.div_(self.world_size)
+
+    def all_gather_into_tensor(self, output_tensor, input_tensor, algo):
+        if algo == 'ring':
+            chunks = list(output_tensor.view(-1).tensor_split(self.world_size))
+            chunks[self.rank].copy_(input_tensor.view(-1))
+            self._ring_all_gather(chunks, list(range(self.world_size)), self.rank)
+        elif algo == 'hierarchical':
+            node_outputs = output_tensor.view(self.num_nodes, -1)
+            torch.distributed.all_gather(list(node_outputs[self.node].view(self.ranks_per_node, -1)),
+                                         input_tensor.view(-1),
+                                         group=self.intra_node_group)
+            torch.distributed.all_gather(list(node_outputs),
+                                         node_outputs[self.node].clone(),
+                                         group=self.inter_node_group)
+        elif algo == 'coalesced':
+            torch.distributed.all_gather(list(output_tensor.view(self.world_size, -1)), input_tensor.view(-1))
+        else:
+            torch.distributed.all_gather_into_tensor(output_tensor, input_tensor)
+
+    def reduce_scatter_tensor(self, output_tensor, input_tensor, op, algo):
+        if algo == 'direct':
+            return torch.distributed.reduce_scatter_tensor(output_tensor, input_tensor, op=op)
+        reduce_op = torch.distributed.ReduceOp.SUM if op == torch.distributed.ReduceOp.AVG else op
+        if algo == 'ring':
+            chunks = list(input_tensor.view(-1).clone().tensor_split(self.world_size))
+            self._ring_reduce_scatter(chunks, list(range(self.world_size)), self.rank, reduce_op)
+            output_tensor.view(-1).copy_(chunks[self.rank])
+        elif algo == 'hierarchical':
+            # [node, local rank, numel] -> [local rank, node, numel], reduced within the node and then across nodes
+            work = input_tensor.view(self.num_nodes, self.ranks_per_node, -1).transpose(0, 1).contiguous()
+            self._ring_reduce_scatter(list(work), self.intra_node_ranks, self.local_rank, reduce_op)
+            chunks = list(work[self.local_rank])
+            self._ring_reduce_scatter(chunks, self.inter_node_ranks, self.node, reduce_op)
+            output_tensor.view(-1).copy_(chunks[self.node])
+        else:
+            work = input_tensor.view(-1).clone()
+            handles = [
+                torch.distributed.all_reduce(chunk, op=reduce_op, async_op=True) for chunk in self._chunks(work)
+            ]
+            for handle in handles:
+                handle.wait()
+            output_tensor.view(-1).copy_(work.view(self.world_size, -1)[self.rank])
+        if op == torch.distributed.ReduceOp.AVG:
+            output_tensor.div_(self.world_size)
+
+    def use_selection(self, tensors, op=None, group=None, async_op=False):
+        """Whether a call can go through a selected algorithm instead of the torch.distributed collective."""
+        if async_op or (group is not None and group != torch.distributed.GroupMember.WORLD):
+            return False
+        if op is not None and not _is_supported_op(op):
+            return False
+        return all(t.is_contiguous() and t.device.type == self.device.type for t in tensors)
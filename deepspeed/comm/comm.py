@@ -67,6 +67,8 @@ class ProcessGroup():
 def _configure_using_config_file(config):
     if config.comms_logger_enabled:
         comms_logger.configure(config)
+    if config.comms_algo_selection.enabled and isinstance(cdb, TorchBackend):
+        cdb.enable_algorithm_selection(**config.comms_algo_selection.dict(exclude={'enabled'}))
 
 
 def configure(
@@ -76,6 +78,7 @@ def configure(
     prof_ops=None,
     verbose=None,
     debug=None,
+    trace=None,
 ):
 
     if deepspeed_config is not None:
@@ -96,11 +99,17 @@ def configure(
     if debug is not None:
         comms_logger.debug = debug
 
+    if trace is not None:
+        comms_logger.trace = trace
+
 
 # Logging wrapper for timing ops
 def timed_op(func):
 
     def log_wrapper(*args, **kwargs):
+        trace_slot = None
+        if comms_logger.straggler_detector is not None:
+            comms_logger.straggler_detector.record_arrival(get_group_from_args(func, *args, **kwargs))
         # Add enabled flag so that overhead to each comm op is two if conditions at most
         if comms_logger.enabled:
             if ('prof' in kwargs
@@ -111,12 +120,19 @@ def timed_op(func):
                 func_args.update(kwargs)
                 msg_size = get_msg_size_from_args(func, *args, **kwargs)
                 log_name = get_debug_log_name(func_args, comms_logger.debug)
-                timers(log_name).start()
+                if comms_logger.trace:
+                    trace_slot = comms_logger.tracer.start(log_name, msg_size,
+                                                           get_group_from_args(func, *args, **kwargs))
+                else:
+                    timers(log_name).start()
         # Return the op, then stop the op's timer
         try:
             return func(*args, **kwargs)
         finally:
-            if comms_logger.enabled:
+            if trace_slot is not None:
+                # Traced ops are not synchronized, their timing events are resolved when the trace is read
+                comms_logger.tracer.stop(trace_slot)
+            elif comms_logger.enabled and not comms_logger.trace:
                 # Need to make op blocking for accurate logging
                 get_accelerator().synchronize()
                 # If we're using MPI, we can't simply sync the stream
@@ -429,6 +445,29 @@ def log_summary(show_straggler=False):
     barrier(log_name='log_summary_barrier')
 
 
+def check_stragglers(global_step, monitor=None):
+    """Advance the straggler detector by one step, a no-op unless straggler detection is enabled.
+
+    Must be called on all ranks. Returns the report of the detection round run at this step, if any.
+    """
+    if comms_logger.straggler_detector is None:
+        return None
+    return comms_logger.straggler_detector.step(global_step, monitor)
+
+
+def export_comms_trace(path=None):
+    """Export the ops recorded in comms logger trace mode as a Chrome trace of this rank.
+
+    The trace is written to ``path`` when given, which should differ between ranks,
+    and is returned as a dictionary.
+    """
+    assert comms_logger.trace, 'comms logger trace mode is not enabled'
+    rank = cdb.get_rank() if cdb is not None and cdb.is_initialized() else 0
+    if path is not None:
+        comms_logger.tracer.export_chrome_trace(path, rank=rank)
+    return comms_logger.tracer.get_chrome_trace(rank=rank)
+
+
 @timed_op
 def reduce(tensor,
            dst,
@@ -3,6 +3,7 @@
 
 # DeepSpeed Team
 
+from typing import Optional
 from pydantic import BaseModel
 from .constants import *
 
@@ -22,6 +23,24 @@ class CommsLoggerConfig(CommsConfig):
     prof_ops: list = COMMS_LOGGER_PROF_OPS_DEFAULT
     verbose: bool = COMMS_LOGGER_VERBOSE_DEFAULT
     debug: bool = COMMS_LOGGER_DEBUG_DEFAULT
+    trace: bool = COMMS_LOGGER_TRACE_DEFAULT
+    trace_buffer_size: int = COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT
+    straggler_detection: bool = COMMS_LOGGER_STRAGGLER_DETECTION_DEFAULT
+    straggler_interval: int = COMMS_LOGGER_STRAGGLER_INTERVAL_DEFAULT
+    straggler_threshold_ms: float = COMMS_LOGGER_STRAGGLER_THRESHOLD_MS_DEFAULT
+    straggler_patience: int = COMMS_LOGGER_STRAGGLER_PATIENCE_DEFAULT
+    straggler_max_samples: int = COMMS_LOGGER_STRAGGLER_MAX_SAMPLES_DEFAULT
+
+
+class CommsAlgoSelectionConfig(CommsConfig):
+    enabled: bool = COMMS_ALGO_SELECTION_ENABLED_DEFAULT
+    ranks_per_node: Optional[int] = COMMS_ALGO_SELECTION_RANKS_PER_NODE_DEFAULT
+    algorithms: list = COMMS_ALGO_SELECTION_ALGORITHMS_DEFAULT
+    min_bytes: int = COMMS_ALGO_SELECTION_MIN_BYTES_DEFAULT
+    max_bytes: int = COMMS_ALGO_SELECTION_MAX_BYTES_DEFAULT
+    iters: int = COMMS_ALGO_SELECTION_ITERS_DEFAULT
+    chunk_bytes: int = COMMS_ALGO_SELECTION_CHUNK_BYTES_DEFAULT
+    profile_path: Optional[str] = COMMS_ALGO_SELECTION_PROFILE_PATH_DEFAULT
 
 
 class DeepSpeedCommsConfig:
@@ -31,3 +50,5 @@ class DeepSpeedCommsConfig:
 
         if self.comms_logger_enabled:
             self.comms_logger = CommsLoggerConfig(**ds_config['comms_logger'])
+
+        self.comms_algo_selection = CommsAlgoSelectionConfig(**ds_config.get(COMMS_ALGO_SELECTION, {}))
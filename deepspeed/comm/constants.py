@@ -25,7 +25,10 @@ The Comms Logger can be specified as:
   "verbose": false,
   "prof_all": true,
   "debug": false,
-  "prof_ops": ["all_reduce", "custom_all_reduce_name"]
+  "prof_ops": ["all_reduce", "custom_all_reduce_name"],
+  "trace": false,
+  "trace_buffer_size": 65536,
+  "straggler_detection": false
 }
 '''
 COMMS_LOGGER = "comms_logger"
@@ -49,3 +52,82 @@ COMMS_LOGGER_DEBUG_DEFAULT = False
 # comms logger profile specific ops in list
 COMMS_LOGGER_PROF_OPS = "prof_ops"
 COMMS_LOGGER_PROF_OPS_DEFAULT = []
+
+# comms logger trace signal, records ops into a ring buffer without synchronizing them
+COMMS_LOGGER_TRACE = "trace"
+COMMS_LOGGER_TRACE_DEFAULT = False
+
+# comms logger number of op records kept in the trace ring buffer
+COMMS_LOGGER_TRACE_BUFFER_SIZE = "trace_buffer_size"
+COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT = 65536
+
+# comms logger straggler detection signal
+COMMS_LOGGER_STRAGGLER_DETECTION = "straggler_detection"
+COMMS_LOGGER_STRAGGLER_DETECTION_DEFAULT = False
+
+# comms logger number of steps between straggler detection rounds
+COMMS_LOGGER_STRAGGLER_INTERVAL = "straggler_interval"
+COMMS_LOGGER_STRAGGLER_INTERVAL_DEFAULT = 100
+
+# comms logger mean arrival delay behind the median rank above which a rank or host is late
+COMMS_LOGGER_STRAGGLER_THRESHOLD_MS = "straggler_threshold_ms"
+COMMS_LOGGER_STRAGGLER_THRESHOLD_MS_DEFAULT = 5.0
+
+# comms logger number of consecutive late rounds before a rank or host is reported
+COMMS_LOGGER_STRAGGLER_PATIENCE = "straggler_patience"
+COMMS_LOGGER_STRAGGLER_PATIENCE_DEFAULT = 3
+
+# comms logger maximum number of collective arrival times exchanged per round
+COMMS_LOGGER_STRAGGLER_MAX_SAMPLES = "straggler_max_samples"
+COMMS_LOGGER_STRAGGLER_MAX_SAMPLES_DEFAULT = 256
+
+#########################################
+# Comms Algorithm Selection
+#########################################
+# Message size and topology aware algorithm selection for the world group all_reduce,
+# all_gather_into_tensor and reduce_scatter_tensor of the torch backend.
+# By default, this feature is not enabled.
+# Users can configure in ds_config.json as below example:
+COMMS_ALGO_SELECTION_FORMAT = '''
+The Comms Algorithm Selection can be specified as:
+"comms_algo_selection": {
+  "enabled": true,
+  "ranks_per_node": null,
+  "algorithms": ["direct", "ring", "hierarchical", "coalesced"],
+  "min_bytes": 4096,
+  "max_bytes": 16777216,
+  "iters": 5,
+  "chunk_bytes": 4194304,
+  "profile_path": "/path/to/comms_profile.json"
+}
+'''
+COMMS_ALGO_SELECTION = "comms_algo_selection"
+
+COMMS_ALGO_SELECTION_ENABLED = "enabled"
+COMMS_ALGO_SELECTION_ENABLED_DEFAULT = False
+
+# Number of ranks per node, defaults to the launcher provided local size
+COMMS_ALGO_SELECTION_RANKS_PER_NODE = "ranks_per_node"
+COMMS_ALGO_SELECTION_RANKS_PER_NODE_DEFAULT = None
+
+# Candidate algorithms, direct is always a candidate
+COMMS_ALGO_SELECTION_ALGORITHMS = "algorithms"
+COMMS_ALGO_SELECTION_ALGORITHMS_DEFAULT = ["direct", "ring", "hierarchical", "coalesced"]
+
+# Smallest and largest benchmarked message sizes, buckets grow by 4x in between
+COMMS_ALGO_SELECTION_MIN_BYTES = "min_bytes"
+COMMS_ALGO_SELECTION_MIN_BYTES_DEFAULT = 4096
+COMMS_ALGO_SELECTION_MAX_BYTES = "max_bytes"
+COMMS_ALGO_SELECTION_MAX_BYTES_DEFAULT = 16 * 1024 * 1024
+
+# Timed iterations per op, message size and algorithm
+COMMS_ALGO_SELECTION_ITERS = "iters"
+COMMS_ALGO_SELECTION_ITERS_DEFAULT = 5
+
+# Chunk size of the coalesced algorithm
+COMMS_ALGO_SELECTION_CHUNK_BYTES = "chunk_bytes"
+COMMS_ALGO_SELECTION_CHUNK_BYTES_DEFAULT = 4 * 1024 * 1024
+
+# Cached profile, loaded when it matches the current topology and written by rank 0 otherwise
+COMMS_ALGO_SELECTION_PROFILE_PATH = "profile_path"
+COMMS_ALGO_SELECTION_PROFILE_PATH_DEFAULT = None
@@ -114,6 +114,7 @@ class TorchBackend(Backend):
         # it is not so we can run on a single GPU without doing any init_process_group
         self.single_gpu_mode = True
         self.init_process_group(backend, timeout, init_method, rank, world_size)
+        self.algorithm_selector = None
 
     @classmethod
     def get_all_gather_function(self):
@@ -146,8 +147,23 @@ class TorchBackend(Backend):
                                                  world_size=world_size)
         self.using_mpi = torch.distributed.get_backend() == 'mpi'
 
+    def enable_algorithm_selection(self, **kwargs):
+        """Benchmark (or load) the collective algorithm of each message size, must be called on all ranks."""
+        from .collective_selector import CollectiveAlgorithmSelector
+        self.algorithm_selector = CollectiveAlgorithmSelector(**kwargs)
+
+    def _selected_algorithm(self, op_name, tensors, nbytes, op=None, group=None, async_op=False):
+        if self.algorithm_selector is None or not self.algorithm_selector.use_selection(tensors, op, group, async_op):
+            return 'direct'
+        return self.algorithm_selector.select(op_name, nbytes)
+
     def all_reduce(self, tensor, op=torch.distributed.ReduceOp.SUM, group=None, async_op=False):
         op = self._reduce_op(op)
+        if self.algorithm_selector is not None:
+            algo = self._selected_algorithm('all_reduce', [tensor], tensor.numel() * tensor.element_size(), op, group,
+                                            async_op)
+            if algo != 'direct':
+                return self.algorithm_selector.all_reduce(tensor, op, algo)
         return torch.distributed.all_reduce(tensor=tensor, op=op, group=group, async_op=async_op)
 
     def inference_all_reduce(self, tensor, op=torch.distributed.ReduceOp.SUM, group=None, async_op=False):
@@ -200,6 +216,13 @@ class TorchBackend(Backend):
             return torch.distributed.all_gather(tensor_list=tensor_list, tensor=tensor, group=group, async_op=async_op)
 
     def all_gather_into_tensor(self, output_tensor, input_tensor, group=None, async_op=False):
+        if self.algorithm_selector is not None:
+            algo = self._selected_algorithm('all_gather_into_tensor', [output_tensor, input_tensor],
+                                            output_tensor.numel() * output_tensor.element_size(),
+                                            group=group,
+                                            async_op=async_op)
+            if algo != 'direct':
+                return self.algorithm_selector.all_gather_into_tensor(output_tensor, input_tensor, algo)
         if self.has_all_gather_into_tensor():
             return self.all_gather_function(output_tensor=output_tensor,
                                             input_tensor=input_tensor,
@@ -247,6 +270,13 @@ class TorchBackend(Backend):
                 reqs[-1].wait()
 
     def reduce_scatter_tensor(self, output_tensor, input_tensor, op=ReduceOp.SUM, group=None, async_op=False):
+        if self.algorithm_selector is not None:
+            algo = self._selected_algorithm('reduce_scatter_tensor', [output_tensor, input_tensor],
+                                            input_tensor.numel() * input_tensor.element_size(), self._reduce_op(op),
+                                            group, async_op)
+            if algo != 'direct':
+                return self.algorithm_selector.reduce_scatter_tensor(output_tensor, input_tensor, self._reduce_op(op),
+                                                                     algo)
         if self.has_reduce_scatter_tensor():
             return self.reduce_scatter_function(output_tensor,
                                                 input_tensor,
@@ -131,3 +131,12 @@ def get_debug_log_name(func_args, debug):
         return func_args['log_name'] + ' | [Caller Func: ' + get_caller_func() + ']'
     else:
         return func_args['log_name']
+
+
+def get_group_from_args(func, *args, **kwargs):
+    if 'group' in kwargs:
+        return kwargs['group']
+    sig_params = list(inspect.signature(func).parameters)
+    if 'group' in sig_params and sig_params.index('group') < len(args):
+        return args[sig_params.index('group')]
+    return None
@@ -659,6 +659,10 @@ def get_dataloader_drop_last(param_dict):
     return get_scalar_param(param_dict, DATALOADER_DROP_LAST, DATALOADER_DROP_LAST_DEFAULT)
 
 
+def get_dataloader_prefetch_batches(param_dict):
+    return get_scalar_param(param_dict, DATALOADER_PREFETCH_BATCHES, DATALOADER_PREFETCH_BATCHES_DEFAULT)
+
+
 '''Write deepspeed config files by modifying basic templates.
 Can be used for quickly changing parameters via command line parameters.'''
 
@@ -875,6 +879,7 @@ class DeepSpeedConfig(object):
         self.aio_config = get_aio_config(param_dict)
 
         self.dataloader_drop_last = get_dataloader_drop_last(param_dict)
+        self.dataloader_prefetch_batches = get_dataloader_prefetch_batches(param_dict)
 
         self.nebula_config = DeepSpeedNebulaConfig(param_dict)
 
@@ -410,6 +410,18 @@ The last incomplete batch can be dropped by setting:
 DATALOADER_DROP_LAST = "dataloader_drop_last"
 DATALOADER_DROP_LAST_DEFAULT = False
 
+#########################################
+# Prefetch batches ahead of the training step
+# #########################################
+# dataloader_prefetch_batches. By default, this feature is not enabled.
+# Users can configure in ds_config.json as below example:
+DATALOADER_PREFETCH_BATCHES_FORMAT = '''
+The number of batches to collate and copy to the device ahead of the training step can be set by:
+"dataloader_prefetch_batches": 2
+'''
+DATALOADER_PREFETCH_BATCHES = "dataloader_prefetch_batches"
+DATALOADER_PREFETCH_BATCHES_DEFAULT = 0
+
 #########################################
 # PIPELINE PARALLELISM
 #########################################
@@ -36,6 +36,8 @@ CURRICULUM_LEARNING_METRIC_PATH = "index_to_metric_path"
 CURRICULUM_LEARNING_CLUSTERING_TYPE = "clustering_type"
 CURRICULUM_LEARNING_SINGLE_CLUSTER = "single_cluster"
 CURRICULUM_LEARNING_CLUSTER_PREFIX = "cluster"
+CURRICULUM_LEARNING_INDEX_RANGE_CLUSTERS = "index_range_clusters"
+CURRICULUM_LEARNING_INDEX_RANGE_CLUSTERS_DEFAULT = False
 CURRICULUM_LEARNING_DIFFICULTY_TYPE = "difficulty_type"
 CURRICULUM_LEARNING_VALUE_BASED = "value"
 CURRICULUM_LEARNING_PERCENTILE_BASED = "percentile"
@@ -60,6 +62,8 @@ CURRICULUM_LEARNING_STEP = "curriculum_step"
 CURRICULUM_LEARNING_CURRENT_DIFFICULTIES = "current_difficulties"
 CURRICULUM_LEARNING_DATA_CLUSTER_PATHS = "data_cluster_paths"
 CURRICULUM_LEARNING_DATA_CLUSTER_CURRENT_POSITION = "data_cluster_current_position"
+CURRICULUM_LEARNING_DATA_CLUSTER_RANGES = "data_cluster_ranges"
+CURRICULUM_LEARNING_DATA_CLUSTER_EPOCHS = "data_cluster_epochs"
 CURRICULUM_LEARNING_NP_RNG_STATE = "np_rng_state"
 
 #########################################
@@ -6,6 +6,7 @@
 import os
 from collections import defaultdict
 import csv
+import shutil
 import time
 from multiprocessing import Process, Manager
 import numpy as np
@@ -14,7 +15,9 @@ from torch.utils.data import BatchSampler, SequentialSampler, DataLoader, Subset
 
 from deepspeed.utils import logger
 from .indexed_dataset import MMapIndexedDataset
-from .utils import split_dataset, split_index, create_mmap_dataset_builder, close_mmap_dataset_builder, find_fit_int_dtype
+from .metrics import VectorizedMetric
+from .utils import split_dataset, split_index, create_mmap_dataset_builder, close_mmap_dataset_builder, find_fit_int_dtype, \
+    get_map_worker_thread_splits, merge_mmap_dataset_files
 
 
 class DataAnalyzer(object):
@@ -36,7 +39,10 @@ class DataAnalyzer(object):
                  custom_map_init=None,
                  custom_map_update=None,
                  custom_map_finalize=None,
-                 custom_reduce=None):
+                 custom_reduce=None,
+                 streaming_reduce=False,
+                 reduce_chunk_size=16777216,
+                 map_chunk_size=65536):
         super().__init__()
         self.dataset = dataset
         self.num_workers = num_workers
@@ -55,6 +61,9 @@ class DataAnalyzer(object):
         self.custom_map_update = custom_map_update
         self.custom_map_finalize = custom_map_finalize
         self.custom_reduce = custom_reduce
+        self.streaming_reduce = streaming_reduce
+        self.reduce_chunk_size = reduce_chunk_size
+        self.map_chunk_size = map_chunk_size
 
     def init_metric_results(self, thread_id, metric_names, metric_types, metric_dtypes, save_path, worker_id):
         metric_results = []
@@ -94,13 +103,7 @@ class DataAnalyzer(object):
                     metric_result["sample_to_metric_builder"].add_item(metric_values[row].reshape(-1))
                     metric_result["metric_to_sample_dict"][metric_values[row].item()].append(
                         data['index'][row][0].item())
-                for m_value in metric_result["metric_to_sample_dict"]:
-                    if len(metric_result["metric_to_sample_dict"][m_value]) > 100:
-                        metric_fname = metric_result["metric_to_sample_fname"]
-                        with open(f"{metric_fname}_{m_value}.csv", 'a') as f:
-                            writer = csv.writer(f)
-                            writer.writerows([metric_result["metric_to_sample_dict"][m_value]])
-                        metric_result["metric_to_sample_dict"][m_value] = []
+                self.flush_metric_to_sample(metric_result, min_samples=100)
             elif metric_type == 'accumulate_value_over_samples':
                 metric_values = metric_function(data)
                 if metric_result["metric_value"] is None:
@@ -108,6 +111,39 @@ class DataAnalyzer(object):
                 else:
                     metric_result["metric_value"].add_(metric_values)
 
+    def flush_metric_to_sample(self, metric_result, min_samples):
+        for m_value in metric_result["metric_to_sample_dict"]:
+            if len(metric_result["metric_to_sample_dict"][m_value]) > min_samples:
+                metric_fname = metric_result["metric_to_sample_fname"]
+                with open(f"{metric_fname}_{m_value}.csv", 'a') as f:
+                    writer = csv.writer(f)
+                    writer.writerows([metric_result["metric_to_sample_dict"][m_value]])
+                metric_result["metric_to_sample_dict"][m_value] = []
+
+    def update_metric_results_vectorized(self, tokens, sizes, start_idx, metric_types, metric_functions,
+                                         metric_results):
+        """Vectorized update_metric_results for the samples [start_idx, start_idx + len(sizes)) whose
+        tokens are stored back to back in the flat array tokens."""
+        for m_idx in range(len(metric_types)):
+            metric_type, metric_function, metric_result = metric_types[m_idx], \
+                metric_functions[m_idx], metric_results[m_idx]
+            metric_values = metric_function(tokens, sizes)
+            if metric_type == 'single_value_per_sample':
+                metric_result["sample_to_metric_builder"].add_items_numpy(metric_values,
+                                                                          np.ones(len(metric_values), dtype=np.int64))
+                order = np.argsort(metric_values, kind='stable')
+                unique_v, value_starts = np.unique(metric_values[order], return_index=True)
+                sample_idx = np.arange(start_idx, start_idx + len(metric_values), dtype=np.int64)[order]
+                for m_value, samples in zip(unique_v.tolist(), np.split(sample_idx, value_starts[1:])):
+                    metric_result["metric_to_sample_dict"][m_value].extend(samples.tolist())
+                self.flush_metric_to_sample(metric_result, min_samples=100)
+            elif metric_type == 'accumulate_value_over_samples':
+                metric_values = torch.from_numpy(metric_values)
+                if metric_result["metric_value"] is None:
+                    metric_result["metric_value"] = metric_values
+                else:
+                    metric_result["metric_value"].add_(metric_values)
+
     def finalize_metric_results(self, metric_types, metric_dtypes, metric_results):
         for m_idx in range(len(metric_types)):
             metric_type, metric_dtype, metric_result = metric_types[m_idx], \
@@ -115,13 +151,7 @@ class DataAnalyzer(object):
             if metric_type == 'single_value_per_sample':
                 metric_fname = metric_result["sample_to_metric_fname"]
                 close_mmap_dataset_builder(metric_result["sample_to_metric_builder"], metric_fname)
-                for m_value in metric_result["metric_to_sample_dict"]:
-                    if len(metric_result["metric_to_sample_dict"][m_value]) > 0:
-                        metric_fname = metric_result["metric_to_sample_fname"]
-                        with open(f"{metric_fname}_{m_value}.csv", 'a') as f:
-                            writer = csv.writer(f)
-                            writer.writerows([metric_result["metric_to_sample_dict"][m_value]])
-                        metric_result["metric_to_sample_dict"][m_value] = []
+                self.flush_metric_to_sample(metric_result, min_samples=0)
             elif metric_type == 'accumulate_value_over_samples':
                 if metric_result["metric_value"] is not None:
                     metric_value_builder = create_mmap_dataset_builder(metric_result["metric_value_fname"],
@@ -129,7 +159,46 @@ class DataAnalyzer(object):
                     metric_value_builder.add_item(metric_result["metric_value"].reshape(-1))
                     close_mmap_dataset_builder(metric_value_builder, metric_result["metric_value_fname"])
 
+    def use_vectorized_map(self):
+        """The vectorized map reads contiguous token ranges of an MMapIndexedDataset and needs every metric
+        to be a VectorizedMetric and no custom map functions. Sample indexes are dataset positions."""
+        return isinstance(self.dataset, MMapIndexedDataset) and len(self.metric_functions) > 0 \
+            and all(isinstance(f, VectorizedMetric) for f in self.metric_functions) \
+            and self.custom_map_init is None and self.custom_map_update is None and self.custom_map_finalize is None
+
+    def run_map_helper_vectorized(self, thread_id):
+        start_idx, end_idx = self.thread_splits[thread_id][0], \
+            self.thread_splits[thread_id][1]
+        logger.info(f"worker {self.worker_id} thread {thread_id}: start vectorized map " \
+            f"on data subset {start_idx} to {end_idx}")
+        metric_results = self.init_metric_results(thread_id, self.metric_names, self.metric_types, self.metric_dtypes,
+                                                  self.save_path, self.worker_id)
+        requires_tokens = any(f.requires_tokens for f in self.metric_functions)
+        all_sizes = self.dataset.sizes
+        total_sample = end_idx - start_idx
+        start = time.time()
+        for chunk_start in range(start_idx, end_idx, self.map_chunk_size):
+            chunk_end = min(end_idx, chunk_start + self.map_chunk_size)
+            sizes = all_sizes[chunk_start:chunk_end].astype(np.int64)
+            tokens = None
+            if requires_tokens:
+                # items are stored back to back, so the whole chunk is one contiguous read
+                tokens = self.dataset.get(chunk_start, length=int(sizes.sum()))
+            self.update_metric_results_vectorized(tokens, sizes, chunk_start, self.metric_types, self.metric_functions,
+                                                  metric_results)
+            processed_sample = chunk_end - start_idx
+            duration = (time.time() - start) / 3600.0
+            remain_duration = duration * total_sample / processed_sample - duration
+            logger.info(
+                f"worker {self.worker_id} thread {thread_id}: {processed_sample} " \
+                f"out of {total_sample} processed in {duration:.2f} hr, " \
+                f"estimated to finish in {remain_duration:.2f} hr")
+        self.finalize_metric_results(self.metric_types, self.metric_dtypes, metric_results)
+        logger.info(f"worker {self.worker_id} thread {thread_id}: finished")
+
     def run_map_helper(self, thread_id):
+        if self.use_vectorized_map():
+            return self.run_map_helper_vectorized(thread_id)
         start_idx, end_idx = self.thread_splits[thread_id][0], \
             self.thread_splits[thread_id][1]
         logger.info(f"worker {self.worker_id} thread {thread_id}: start working " \
@@ -324,12 +393,10 @@ class DataAnalyzer(object):
                     p[t_idx_reduce].join()
 
                 sample_to_metric_fname = f"{metric_save_path}/{metric_name}_sample_to_metric"
-                sample_to_metric_builder = create_mmap_dataset_builder(sample_to_metric_fname, metric_value_dtype)
-                for t_idx_reduce in range(num_threads_reduce):
-                    chunk_fname = f"{metric_save_path}/{metric_name}_sample_to_metric_thread{t_idx_reduce}"
-                    logger.info(f"Merging file {chunk_fname}")
-                    sample_to_metric_builder.merge_file_(chunk_fname)
-                close_mmap_dataset_builder(sample_to_metric_builder, sample_to_metric_fname)
+                merge_mmap_dataset_files([
+                    f"{metric_save_path}/{metric_name}_sample_to_metric_thread{t_idx_reduce}"
+                    for t_idx_reduce in range(num_threads_reduce)
+                ], sample_to_metric_fname)
                 sample_to_metric = MMapIndexedDataset(sample_to_metric_fname, skip_warmup=True)
                 assert len(sample_to_metric) == total_num_samples
 
@@ -355,18 +422,15 @@ class DataAnalyzer(object):
                 for t_idx_reduce in range(num_threads_reduce):
                     p[t_idx_reduce].join()
                 index_to_sample_fname = f"{metric_save_path}/{metric_name}_index_to_sample"
-                index_to_sample_builder = create_mmap_dataset_builder(index_to_sample_fname, sample_idx_dtype)
+                merge_mmap_dataset_files([
+                    f"{metric_save_path}/{metric_name}_index_to_sample_thread{t_idx_reduce}"
+                    for t_idx_reduce in range(num_threads_reduce)
+                ], index_to_sample_fname)
                 index_to_metric_fname = f"{metric_save_path}/{metric_name}_index_to_metric"
-                index_to_metric_builder = create_mmap_dataset_builder(index_to_metric_fname, metric_value_dtype)
-                for t_idx_reduce in range(num_threads_reduce):
-                    chunk_is_fname = f"{metric_save_path}/{metric_name}_index_to_sample_thread{t_idx_reduce}"
-                    logger.info(f"Merging file {chunk_is_fname}")
-                    index_to_sample_builder.merge_file_(chunk_is_fname)
-                    chunk_im_fname = f"{metric_save_path}/{metric_name}_index_to_metric_thread{t_idx_reduce}"
-                    logger.info(f"Merging file {chunk_im_fname}")
-                    index_to_metric_builder.merge_file_(chunk_im_fname)
-                close_mmap_dataset_builder(index_to_sample_builder, index_to_sample_fname)
-                close_mmap_dataset_builder(index_to_metric_builder, index_to_metric_fname)
+                merge_mmap_dataset_files([
+                    f"{metric_save_path}/{metric_name}_index_to_metric_thread{t_idx_reduce}"
+                    for t_idx_reduce in range(num_threads_reduce)
+                ], index_to_metric_fname)
                 num_sample_per_value = {}
                 index_to_sample = MMapIndexedDataset(index_to_sample_fname, skip_warmup=True)
                 index_to_metric = MMapIndexedDataset(index_to_metric_fname, skip_warmup=True)
@@ -390,28 +454,255 @@ class DataAnalyzer(object):
                 self.get_metric_value_percentiles(metric_name, num_sample_per_value, total_num_samples)
             elif metric_type == 'accumulate_value_over_samples':
                 metric_save_path = f"{save_path}/{metric_name}/"
-                metric_value = None
-                for w_idx in range(num_workers):
-                    for t_idx in range(num_threads):
-                        w_metric_save_path = f"{metric_save_path}/worker{w_idx}_thread{t_idx}/"
-                        w_metric_value_fname = f"{w_metric_save_path}/{metric_name}_metric_value"
-                        w_metric_value = MMapIndexedDataset(w_metric_value_fname, skip_warmup=True)
-                        if metric_value is None:
-                            metric_value = np.copy(w_metric_value[0])
-                        else:
-                            metric_value += np.copy(w_metric_value[0])
-                value_max = int(max(metric_value))
-                value_min = int(min(metric_value))
+                self.merge_metric_value(metric_save_path, metric_name, num_workers, num_threads)
+
+    def merge_metric_value(self, metric_save_path, metric_name, num_workers, num_threads):
+        metric_value = None
+        for w_idx in range(num_workers):
+            for t_idx in range(num_threads):
+                w_metric_save_path = f"{metric_save_path}/worker{w_idx}_thread{t_idx}/"
+                w_metric_value_fname = f"{w_metric_save_path}/{metric_name}_metric_value"
+                w_metric_value = MMapIndexedDataset(w_metric_value_fname, skip_warmup=True)
+                if metric_value is None:
+                    metric_value = np.copy(w_metric_value[0])
+                else:
+                    metric_value += np.copy(w_metric_value[0])
+        value_max = int(max(metric_value))
+        value_min = int(min(metric_value))
+        metric_value_dtype = find_fit_int_dtype(value_min, value_max)
+        metric_value_fname = f"{metric_save_path}/{metric_name}_metric_value"
+        metric_value_builder = create_mmap_dataset_builder(metric_value_fname, metric_value_dtype)
+        metric_value_builder.add_item(torch.tensor(metric_value.astype(np.int64), dtype=torch.long))
+        close_mmap_dataset_builder(metric_value_builder, metric_value_fname)
+
+    def gather_metric_value_counts(self, metric_save_path, metric_name, map_worker_thread):
+        """Count the samples per metric value in each map output, caching the counts for resumption."""
+        for w_idx, t_idx, _, _ in map_worker_thread:
+            w_metric_save_path = f"{metric_save_path}/worker{w_idx}_thread{t_idx}/"
+            value_counts_fname = f"{w_metric_save_path}/{metric_name}_value_counts.npz"
+            if os.path.isfile(value_counts_fname):
+                continue
+            w_sample_to_metric = MMapIndexedDataset(f"{w_metric_save_path}/{metric_name}_sample_to_metric",
+                                                    skip_warmup=True)
+            if len(w_sample_to_metric) > 0:
+                unique_v, counts = np.unique(w_sample_to_metric.get(0, length=len(w_sample_to_metric)),
+                                             return_counts=True)
+            else:
+                unique_v, counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            tmp_fname = f"{w_metric_save_path}/{metric_name}_value_counts.tmp.npz"
+            np.savez(tmp_fname, values=unique_v.astype(np.int64), counts=counts.astype(np.int64))
+            os.replace(tmp_fname, value_counts_fname)
+            logger.info(f"Finished gathering map stats from worker {w_idx} thread {t_idx}.")
+
+    def sort_metric_runs(self, t_idx_reduce, metric_save_path, metric_name, sample_idx_dtype, value_min, value_max,
+                         map_worker_thread, run_path):
+        """Write the samples with metric values in [value_min, value_max] as runs sorted by (value, sample).
+
+        Each run covers up to reduce_chunk_size consecutive samples of one map output. Runs are stored as
+        a .npy file of sample indexes plus a .npz of the (value, count) pairs, the latter written last so
+        that finished runs are skipped when the reduce is resumed.
+        """
+        run_fnames = []
+        for w_idx, t_idx, start_idx, end_idx in map_worker_thread:
+            w_metric_save_path = f"{metric_save_path}/worker{w_idx}_thread{t_idx}/"
+            w_sample_to_metric = None
+            for c_idx, chunk_start in enumerate(range(0, end_idx - start_idx, self.reduce_chunk_size)):
+                run_fname = f"{run_path}/worker{w_idx}_thread{t_idx}_chunk{c_idx}"
+                run_fnames.append(run_fname)
+                if os.path.isfile(f"{run_fname}.counts.npz"):
+                    continue
+                if w_sample_to_metric is None:
+                    w_sample_to_metric = MMapIndexedDataset(f"{w_metric_save_path}/{metric_name}_sample_to_metric",
+                                                            skip_warmup=True)
+                chunk_len = min(self.reduce_chunk_size, end_idx - start_idx - chunk_start)
+                values = w_sample_to_metric.get(0, offset=chunk_start, length=chunk_len)
+                selected = np.nonzero((values >= value_min) & (values <= value_max))[0]
+                selected_values = values[selected]
+                order = np.argsort(selected_values, kind='stable')
+                samples = (selected[order] + (start_idx + chunk_start)).astype(sample_idx_dtype)
+                unique_v, counts = np.unique(selected_values[order], return_counts=True)
+                np.save(f"{run_fname}.samples.npy", samples)
+                np.savez(f"{run_fname}.counts.tmp.npz", values=unique_v.astype(np.int64), counts=counts)
+                os.replace(f"{run_fname}.counts.tmp.npz", f"{run_fname}.counts.npz")
+            logger.info(f"Reduce thread {t_idx_reduce}: finished sorting runs of worker {w_idx} thread {t_idx}.")
+        return run_fnames
+
+    def merge_metric_runs(self, t_idx_reduce, metric_save_path, metric_name, sample_idx_dtype, metric_value_dtype,
+                          unique_metric_values, merge_step, map_worker_thread):
+        """Reduce one contiguous range of metric values with a streaming k-way merge of sorted runs."""
+        done_fname = f"{metric_save_path}/{metric_name}_reduce_thread{t_idx_reduce}.done"
+        if os.path.isfile(done_fname):
+            logger.info(f"Reduce thread {t_idx_reduce}: output already exists, skipping.")
+            return
+        index_to_sample_fname = f"{metric_save_path}/{metric_name}_index_to_sample_thread{t_idx_reduce}"
+        index_to_metric_fname = f"{metric_save_path}/{metric_name}_index_to_metric_thread{t_idx_reduce}"
+        merged_fname = f"{metric_save_path}/{metric_name}_index_to_sample_percentile_merged_thread{t_idx_reduce}"
+        index_to_sample_builder = create_mmap_dataset_builder(index_to_sample_fname, sample_idx_dtype)
+        index_to_metric_builder = create_mmap_dataset_builder(index_to_metric_fname, metric_value_dtype)
+        merged_builder = create_mmap_dataset_builder(merged_fname, sample_idx_dtype)
+
+        if len(unique_metric_values) > 0:
+            run_path = f"{metric_save_path}/{metric_name}_reduce_runs/thread{t_idx_reduce}"
+            os.makedirs(run_path, exist_ok=True)
+            run_fnames = self.sort_metric_runs(t_idx_reduce, metric_save_path, metric_name, sample_idx_dtype,
+                                               unique_metric_values[0], unique_metric_values[-1], map_worker_thread,
+                                               run_path)
+            # runs are in sample order, so concatenating the per-run segments of a value keeps samples sorted
+            runs = []
+            for run_fname in run_fnames:
+                run_counts = np.load(f"{run_fname}.counts.npz")
+                runs.append({
+                    "samples": np.load(f"{run_fname}.samples.npy", mmap_mode='r'),
+                    "values": run_counts["values"],
+                    "offsets": np.concatenate([[0], np.cumsum(run_counts["counts"])]),
+                    "cursor": 0
+                })
+            merged_samples = []
+            for v_idx, unique_v in enumerate(unique_metric_values):
+                segments = []
+                for run in runs:
+                    cursor = run["cursor"]
+                    if cursor < len(run["values"]) and run["values"][cursor] == unique_v:
+                        segments.append(run["samples"][run["offsets"][cursor]:run["offsets"][cursor + 1]])
+                        run["cursor"] += 1
+                samples = np.concatenate(segments) if segments else np.empty(0, dtype=sample_idx_dtype)
+                index_to_sample_builder.add_item_numpy(samples)
+                index_to_metric_builder.add_item_numpy(np.array([unique_v], dtype=metric_value_dtype))
+                merged_samples.append(samples)
+                if (v_idx + 1) % merge_step == 0 or v_idx == len(unique_metric_values) - 1:
+                    merged_builder.add_item_numpy(np.concatenate(merged_samples))
+                    merged_samples = []
+            assert all(run["cursor"] == len(run["values"]) for run in runs)
+
+        close_mmap_dataset_builder(index_to_sample_builder, index_to_sample_fname)
+        close_mmap_dataset_builder(index_to_metric_builder, index_to_metric_fname)
+        close_mmap_dataset_builder(merged_builder, merged_fname)
+        with open(done_fname, 'w'):
+            pass
+        shutil.rmtree(f"{metric_save_path}/{metric_name}_reduce_runs/thread{t_idx_reduce}", ignore_errors=True)
+        logger.info(f"Reduce thread {t_idx_reduce}: finished reducing metric {metric_name} values "
+                    f"{unique_metric_values[0] if len(unique_metric_values) else None} to "
+                    f"{unique_metric_values[-1] if len(unique_metric_values) else None}.")
+
+    def merge_map_results_streaming(self, dataset, metric_names, metric_types, save_path, num_workers, num_threads,
+                                    num_threads_reduce):
+        """Same outputs as merge_map_results, computed without loading whole map outputs in memory.
+
+        The metric value range is split into num_threads_reduce contiguous partitions holding roughly the
+        same number of samples. Each reduce process sorts its values' samples into bounded runs and k-way
+        merges them straight into its builders, and the partitions are concatenated at the end. Sample
+        indexes are the positions of the samples in the dataset. Finished runs and partitions are kept,
+        so calling this again after a failure resumes from the partial output.
+        """
+        total_num_samples = len(dataset)
+        sample_idx_dtype = find_fit_int_dtype(0, total_num_samples - 1)
+        logger.info(
+            f"Total number of data samples: {total_num_samples}. Will use {sample_idx_dtype} to store the sample indexes."
+        )
+        map_worker_thread = get_map_worker_thread_splits(total_num_samples, num_workers, num_threads)
+        for m_idx in range(len(metric_names)):
+            metric_name, metric_type = metric_names[m_idx], metric_types[m_idx]
+            metric_save_path = f"{save_path}/{metric_name}/"
+            if metric_type == 'single_value_per_sample':
+                # metric value counts
+                thread_splits = split_index(0, len(map_worker_thread), num_threads_reduce)
+                p = []
+                for t_idx_reduce in range(num_threads_reduce):
+                    start_idx, end_idx = thread_splits[t_idx_reduce][0], thread_splits[t_idx_reduce][1]
+                    p.append(
+                        Process(target=self.gather_metric_value_counts,
+                                args=(
+                                    metric_save_path,
+                                    metric_name,
+                                    map_worker_thread[start_idx:end_idx],
+                                )))
+                    p[t_idx_reduce].start()
+                for t_idx_reduce in range(num_threads_reduce):
+                    p[t_idx_reduce].join()
+                    assert p[t_idx_reduce].exitcode == 0, f"Reduce thread {t_idx_reduce} failed, rerun to resume."
+                all_values, all_counts = [], []
+                for w_idx, t_idx, _, _ in map_worker_thread:
+                    value_counts = np.load(f"{metric_save_path}/worker{w_idx}_thread{t_idx}/"
+                                           f"{metric_name}_value_counts.npz")
+                    all_values.append(value_counts["values"])
+                    all_counts.append(value_counts["counts"])
+                unique_metric_values, inverse = np.unique(np.concatenate(all_values), return_inverse=True)
+                num_samples_per_value = np.zeros(len(unique_metric_values), dtype=np.int64)
+                np.add.at(num_samples_per_value, inverse, np.concatenate(all_counts))
+                sample_to_metric_count = int(num_samples_per_value.sum())
+                assert sample_to_metric_count == total_num_samples, "The number of samples in map result files are not correct. It's possible that some map worker didn't finish successfully."
+                value_min, value_max = int(unique_metric_values[0]), int(unique_metric_values[-1])
                 metric_value_dtype = find_fit_int_dtype(value_min, value_max)
-                metric_value_fname = f"{metric_save_path}/{metric_name}_metric_value"
-                metric_value_builder = create_mmap_dataset_builder(metric_value_fname, metric_value_dtype)
-                metric_value_builder.add_item(torch.tensor(metric_value.astype(np.int64), dtype=torch.long))
-                close_mmap_dataset_builder(metric_value_builder, metric_value_fname)
+                logger.info(
+                    f"Metric {metric_name} has values between {value_min} and {value_max}. Will use {metric_value_dtype} to store the metric values."
+                )
+
+                # sample_to_metric, streamed in chunks since it is only a dtype conversion of the map outputs
+                sample_to_metric_fname = f"{metric_save_path}/{metric_name}_sample_to_metric"
+                sample_to_metric_builder = create_mmap_dataset_builder(sample_to_metric_fname, metric_value_dtype)
+                for w_idx, t_idx, _, _ in map_worker_thread:
+                    w_sample_to_metric = MMapIndexedDataset(
+                        f"{metric_save_path}/worker{w_idx}_thread{t_idx}/{metric_name}_sample_to_metric",
+                        skip_warmup=True)
+                    for chunk_start in range(0, len(w_sample_to_metric), self.reduce_chunk_size):
+                        chunk_len = min(self.reduce_chunk_size, len(w_sample_to_metric) - chunk_start)
+                        sample_to_metric_builder.add_items_numpy(
+                            w_sample_to_metric.get(0, offset=chunk_start, length=chunk_len),
+                            np.ones(chunk_len, dtype=np.int32))
+                close_mmap_dataset_builder(sample_to_metric_builder, sample_to_metric_fname)
+
+                # metric_to_sample, partitioned by value range with boundaries at merge_step multiples so
+                # that every partition also produces whole index_to_sample_percentile_merged items
+                merge_step = max(1, len(unique_metric_values) // 100)
+                group_starts = np.arange(0, len(unique_metric_values), merge_step)
+                group_cumsum = np.cumsum(np.add.reduceat(num_samples_per_value, group_starts))
+                targets = total_num_samples * np.arange(1, num_threads_reduce) / num_threads_reduce
+                boundaries = np.concatenate([[0],
+                                             np.searchsorted(group_cumsum, targets, side='left') + 1,
+                                             [len(group_starts)]])
+                boundaries = np.minimum(np.maximum.accumulate(boundaries), len(group_starts)) * merge_step
+                boundaries = np.minimum(boundaries, len(unique_metric_values))
+                p = []
+                for t_idx_reduce in range(num_threads_reduce):
+                    start_idx, end_idx = boundaries[t_idx_reduce], boundaries[t_idx_reduce + 1]
+                    p.append(
+                        Process(target=self.merge_metric_runs,
+                                args=(
+                                    t_idx_reduce,
+                                    metric_save_path,
+                                    metric_name,
+                                    sample_idx_dtype,
+                                    metric_value_dtype,
+                                    unique_metric_values[start_idx:end_idx],
+                                    merge_step,
+                                    map_worker_thread,
+                                )))
+                    p[t_idx_reduce].start()
+                for t_idx_reduce in range(num_threads_reduce):
+                    p[t_idx_reduce].join()
+                    assert p[t_idx_reduce].exitcode == 0, f"Reduce thread {t_idx_reduce} failed, rerun to resume."
+
+                for suffix, dtype in [("index_to_sample", sample_idx_dtype), ("index_to_metric", metric_value_dtype),
+                                      ("index_to_sample_percentile_merged", sample_idx_dtype)]:
+                    fname = f"{metric_save_path}/{metric_name}_{suffix}"
+                    merge_mmap_dataset_files(
+                        [f"{fname}_thread{t_idx_reduce}" for t_idx_reduce in range(num_threads_reduce)], fname)
+                for t_idx_reduce in range(num_threads_reduce):
+                    os.remove(f"{metric_save_path}/{metric_name}_reduce_thread{t_idx_reduce}.done")
+                shutil.rmtree(f"{metric_save_path}/{metric_name}_reduce_runs", ignore_errors=True)
+                self.get_metric_value_percentiles(metric_name, dict(zip(unique_metric_values, num_samples_per_value)),
+                                                  total_num_samples)
+            elif metric_type == 'accumulate_value_over_samples':
+                self.merge_metric_value(metric_save_path, metric_name, num_workers, num_threads)
 
     def run_reduce(self):
         if self.custom_reduce is None:
-            self.merge_map_results(self.dataset, self.metric_names, self.metric_types, self.save_path,
-                                   self.num_workers, self.num_threads, self.num_threads_reduce)
+            if self.streaming_reduce:
+                self.merge_map_results_streaming(self.dataset, self.metric_names, self.metric_types, self.save_path,
+                                                 self.num_workers, self.num_threads, self.num_threads_reduce)
+            else:
+                self.merge_map_results(self.dataset, self.metric_names, self.metric_types, self.save_path,
+                                       self.num_workers, self.num_threads, self.num_threads_reduce)
         else:
             self.custom_reduce(self.dataset, self.metric_names, self.metric_types, self.save_path, self.num_workers,
                                self.num_threads, self.num_threads_reduce)
@@ -30,7 +30,7 @@ from deepspeed.accelerator import get_accelerator
 from ..constants import *
 from ..curriculum_scheduler import CurriculumScheduler
 from .indexed_dataset import MMapIndexedDataset
-from .utils import create_mmap_dataset_builder, close_mmap_dataset_builder, find_fit_int_dtype
+from .utils import create_mmap_dataset_builder, close_mmap_dataset_builder, find_fit_int_dtype, FeistelPermutation
 
 
 class DeepSpeedDataSampler(object):
@@ -76,9 +76,21 @@ class DeepSpeedDataSampler(object):
             self.difficulty_type = {}
             self.clustering_type = {}
             self.data_1epoch_size = None
-            if self.global_rank == 0:
+            # With index range clusters, a cluster is a list of [start, end) ranges of positions in the
+            # sorted index_to_sample of the clustering metric, and samples are drawn through a seeded
+            # permutation of the cluster instead of a shuffled copy saved under data_cluster_path.
+            self.index_range_clusters = self.data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING].get(
+                CURRICULUM_LEARNING_INDEX_RANGE_CLUSTERS, CURRICULUM_LEARNING_INDEX_RANGE_CLUSTERS_DEFAULT)
+            if self.global_rank == 0 or self.index_range_clusters:
                 self.data_clusters = []
                 self.data_cluster_sizes = []
+            if self.index_range_clusters:
+                self.data_cluster_epochs = []
+                self.index_range_metric = None
+                self.curriculum_sorted_samples = None
+                self.curriculum_row_offsets = None
+                self.curriculum_row_values = None
+            elif self.global_rank == 0:
                 cluster_path = self.data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][
                     CURRICULUM_LEARNING_CLUSTER_PATH]
                 if not os.path.exists(cluster_path):
@@ -90,7 +102,7 @@ class DeepSpeedDataSampler(object):
                     CURRICULUM_LEARNING_METRICS][metric][CURRICULUM_LEARNING_DIFFICULTY_TYPE]
                 self.clustering_type[metric] = data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][
                     CURRICULUM_LEARNING_METRICS][metric][CURRICULUM_LEARNING_CLUSTERING_TYPE]
-                if self.global_rank == 0:
+                if self.global_rank == 0 or self.index_range_clusters:
                     if self.clustering_type[metric] != CURRICULUM_LEARNING_SINGLE_CLUSTER:
                         self.curriculum_index_to_sample[metric] = MMapIndexedDataset(
                             data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][CURRICULUM_LEARNING_METRICS]
@@ -101,6 +113,8 @@ class DeepSpeedDataSampler(object):
                                 data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][CURRICULUM_LEARNING_METRICS]
                                 [metric][CURRICULUM_LEARNING_METRIC_PATH],
                                 skip_warmup=True)
+            if self.index_range_clusters:
+                self.init_index_range_metric()
 
         # Sanity checks.
         assert self.total_samples > 0, \
@@ -162,7 +176,100 @@ class DeepSpeedDataSampler(object):
                 break
         return new_samples
 
+    def init_index_range_metric(self):
+        clustering_metrics = [
+            metric for metric in self.clustering_type
+            if self.clustering_type[metric] != CURRICULUM_LEARNING_SINGLE_CLUSTER
+        ]
+        # Intersections of clusters from several metrics are not ranges of a single sorted index.
+        assert len(clustering_metrics) <= 1, \
+            f"{CURRICULUM_LEARNING_INDEX_RANGE_CLUSTERS} supports at most one metric that needs clustering, " \
+            f"got {clustering_metrics}"
+        if len(clustering_metrics) == 0:
+            return
+        metric = clustering_metrics[0]
+        self.index_range_metric = metric
+        index_to_sample = self.curriculum_index_to_sample[metric]
+        # The rows of index_to_sample are stored back to back, so all samples in metric order are a single
+        # memory-mapped read and a cluster can be addressed by positions in it.
+        self.curriculum_row_offsets = np.zeros(len(index_to_sample) + 1, dtype=np.int64)
+        np.cumsum(index_to_sample.sizes, out=self.curriculum_row_offsets[1:])
+        self.data_1epoch_size = int(self.curriculum_row_offsets[-1])
+        self.curriculum_sorted_samples = index_to_sample.get(0, length=self.data_1epoch_size)
+        if self.difficulty_type[metric] == CURRICULUM_LEARNING_VALUE_BASED:
+            index_to_metric = self.curriculum_index_to_metric[metric]
+            self.curriculum_row_values = index_to_metric.get(0, length=int(index_to_metric.sizes.sum()))
+
+    def get_index_range_based_on_metric_value(self, value_start, value_end):
+        row_start = np.searchsorted(self.curriculum_row_values, value_start, side='right')
+        row_end = np.searchsorted(self.curriculum_row_values, value_end, side='right')
+        return [int(self.curriculum_row_offsets[row_start]), int(self.curriculum_row_offsets[max(row_start, row_end)])]
+
+    def get_index_range_based_on_metric_percentile(self, metric, percentile_start, percentile_end):
+        max_percentile = self.data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][CURRICULUM_LEARNING_METRICS][
+            metric][CURRICULUM_LEARNING_MAX_DIFFICULTY]
+        sample_per_percentile = self.data_1epoch_size // max_percentile
+        start_count = sample_per_percentile * percentile_start
+        end_count = sample_per_percentile * percentile_end
+        if percentile_end == max_percentile:
+            end_count = self.data_1epoch_size
+        return [int(start_count), int(max(start_count, min(end_count, self.data_1epoch_size)))]
+
+    def get_new_index_range_cluster(self, previous_difficulties):
+        cluster_fname = CURRICULUM_LEARNING_CLUSTER_PREFIX
+        for metric in self.curriculum_schedulers:
+            cluster_fname = f"{cluster_fname}_{metric}{self.current_difficulties[metric]}"
+        new_ranges = []
+        metric = self.index_range_metric
+        if metric is None:
+            if len(self.data_clusters) == 0:
+                new_ranges = [[0, self.one_epoch_total_samples]]
+        elif self.difficulty_type[metric] == CURRICULUM_LEARNING_VALUE_BASED:
+            new_ranges = [
+                self.get_index_range_based_on_metric_value(previous_difficulties[metric],
+                                                           self.current_difficulties[metric])
+            ]
+        elif self.difficulty_type[metric] == CURRICULUM_LEARNING_PERCENTILE_BASED:
+            new_ranges = [
+                self.get_index_range_based_on_metric_percentile(metric, previous_difficulties[metric],
+                                                                self.current_difficulties[metric])
+            ]
+        new_ranges = [r for r in new_ranges if r[1] > r[0]]
+        cluster_size = sum(r[1] - r[0] for r in new_ranges)
+        if cluster_size > 0:
+            if self.global_rank == 0:
+                logger.info(
+                    f"new data cluster (previous_difficulties {previous_difficulties}, current_difficulties {self.current_difficulties}) with size {cluster_size} generated."
+                )
+            self.data_clusters.append(new_ranges)
+            self.data_cluster_sizes.append(cluster_size)
+            self.data_cluster_paths.append(cluster_fname)
+            self.data_cluster_current_position.append(0)
+            self.data_cluster_epochs.append(0)
+        elif self.global_rank == 0:
+            logger.info(
+                f"new data cluster (previous_difficulties {previous_difficulties}, current_difficulties {self.current_difficulties}) has no matched data thus skipped."
+            )
+
+    def get_index_range_samples(self, cidx, start_idx, end_idx):
+        """Samples at shuffled positions [start_idx, end_idx) of index range cluster cidx."""
+        seed = np.random.SeedSequence(
+            [self.data_efficiency_config[DATA_EFFICIENCY_SEED], cidx,
+             self.data_cluster_epochs[cidx]]).generate_state(1)[0]
+        offsets = FeistelPermutation(self.data_cluster_sizes[cidx], seed)(np.arange(start_idx, end_idx))
+        ranges = np.array(self.data_clusters[cidx], dtype=np.int64).reshape(-1, 2)
+        range_sizes = ranges[:, 1] - ranges[:, 0]
+        range_ends = np.cumsum(range_sizes)
+        range_idx = np.searchsorted(range_ends, offsets, side='right')
+        positions = ranges[range_idx, 0] + offsets - (range_ends - range_sizes)[range_idx]
+        if self.curriculum_sorted_samples is None:
+            return positions.tolist()
+        return self.curriculum_sorted_samples[positions].tolist()
+
     def get_new_cluster(self, previous_difficulties):
+        if self.index_range_clusters:
+            self.get_new_index_range_cluster(previous_difficulties)
+            return
         cluster_fname = CURRICULUM_LEARNING_CLUSTER_PREFIX
         for metric in self.curriculum_schedulers:
             cluster_fname = f"{cluster_fname}_{metric}{self.current_difficulties[metric]}"
@@ -243,7 +350,23 @@ class DeepSpeedDataSampler(object):
         close_mmap_dataset_builder(cluster_builder, cluster_path)
         self.data_clusters[cidx] = MMapIndexedDataset(cluster_path, skip_warmup=True)
 
+    def get_sample_from_index_range_cluster(self, cidx, num_samples):
+        start_idx = self.data_cluster_current_position[cidx]
+        end_idx = min(start_idx + num_samples, self.data_cluster_sizes[cidx])
+        samples = self.get_index_range_samples(cidx, start_idx, end_idx)
+        self.data_cluster_current_position[cidx] += num_samples
+        if len(samples) < num_samples:
+            num_samples_remained = num_samples - len(samples)
+            logger.info(f"reshuffling cluster {cidx}.")
+            # a new epoch of the cluster draws a different permutation
+            self.data_cluster_epochs[cidx] += 1
+            samples += self.get_index_range_samples(cidx, 0, num_samples_remained)
+            self.data_cluster_current_position[cidx] = num_samples_remained
+        return samples
+
     def get_sample_from_cluster(self, cidx, num_samples):
+        if self.index_range_clusters:
+            return self.get_sample_from_index_range_cluster(cidx, num_samples)
         start_idx = self.data_cluster_current_position[cidx]
         samples = list(np.copy(self.data_clusters[cidx][0][start_idx:(start_idx + num_samples)]))
         self.data_cluster_current_position[cidx] += num_samples
@@ -303,7 +426,7 @@ class DeepSpeedDataSampler(object):
                 current_batch = []
 
     def state_dict(self):
-        return {
+        state_dict = {
             CURRICULUM_LEARNING_BATCH: self.batch,
             CURRICULUM_LEARNING_CONSUMED_SAMPLES: self.consumed_samples,
             CURRICULUM_LEARNING_STEP: self.curriculum_step,
@@ -312,6 +435,10 @@ class DeepSpeedDataSampler(object):
             CURRICULUM_LEARNING_DATA_CLUSTER_CURRENT_POSITION: self.data_cluster_current_position,
             CURRICULUM_LEARNING_NP_RNG_STATE: np.random.get_state()
         }
+        if self.index_range_clusters:
+            state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_RANGES] = self.data_clusters
+            state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_EPOCHS] = self.data_cluster_epochs
+        return state_dict
 
     def load_state_dict(self, state_dict):
         self.batch = state_dict[CURRICULUM_LEARNING_BATCH]
@@ -321,6 +448,12 @@ class DeepSpeedDataSampler(object):
         self.data_cluster_paths = state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_PATHS]
         self.data_cluster_current_position = state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_CURRENT_POSITION]
         np.random.set_state(state_dict[CURRICULUM_LEARNING_NP_RNG_STATE])
+        if self.index_range_clusters:
+            self.data_clusters = [[list(r) for r in ranges]
+                                  for ranges in state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_RANGES]]
+            self.data_cluster_sizes = [sum(r[1] - r[0] for r in ranges) for ranges in self.data_clusters]
+            self.data_cluster_epochs = list(state_dict[CURRICULUM_LEARNING_DATA_CLUSTER_EPOCHS])
+            return
         cluster_root_path = self.data_efficiency_config[DATA_SAMPLING][CURRICULUM_LEARNING][
             CURRICULUM_LEARNING_CLUSTER_PATH]
         # Backward compatibility: previously data_cluster_paths were stored as
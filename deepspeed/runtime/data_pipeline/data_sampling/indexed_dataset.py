@@ -20,10 +20,13 @@ Part of this code was adopted from https://github.com/NVIDIA/Megatron-LM/blob/ma
 # Some of the fixes/improvements are adopted from
 # https://github.com/bigscience-workshop/Megatron-DeepSpeed/blob/main/megatron/data/indexed_dataset.py
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 import os
 import shutil
 import struct
+import zlib
 from itertools import accumulate
 
 import numpy as np
@@ -38,7 +41,7 @@ def __best_fitting_dtype(vocab_size=None):
 
 
 def get_available_dataset_impl():
-    return ['lazy', 'cached', 'mmap']
+    return ['lazy', 'cached', 'mmap', 'compressed_mmap']
 
 
 def infer_dataset_impl(path):
@@ -49,6 +52,8 @@ def infer_dataset_impl(path):
                 return 'cached'
             elif magic == MMapIndexedDataset.Index._HDR_MAGIC[:8]:
                 return 'mmap'
+            elif magic == CompressedMMapIndexedDataset.Index._HDR_MAGIC[:8]:
+                return 'compressed_mmap'
             else:
                 return None
     else:
@@ -60,6 +65,8 @@ def infer_dataset_impl(path):
 def make_builder(out_file, impl, vocab_size=None):
     if impl == 'mmap':
         return MMapIndexedDatasetBuilder(out_file, dtype=__best_fitting_dtype(vocab_size))
+    elif impl == 'compressed_mmap':
+        return CompressedMMapIndexedDatasetBuilder(out_file, dtype=__best_fitting_dtype(vocab_size))
     else:
         return IndexedDatasetBuilder(out_file)
 
@@ -77,6 +84,8 @@ def make_dataset(path, impl, skip_warmup=False):
         return IndexedCachedDataset(path)
     elif impl == 'mmap' and MMapIndexedDataset.exists(path):
         return MMapIndexedDataset(path, skip_warmup)
+    elif impl == 'compressed_mmap' and CompressedMMapIndexedDataset.exists(path):
+        return CompressedMMapIndexedDataset(path)
     print(f"Unknown dataset implementation: {impl}")
     return None
 
@@ -84,6 +93,8 @@ def make_dataset(path, impl, skip_warmup=False):
 def dataset_exists(path, impl):
     if impl == 'mmap':
         return MMapIndexedDataset.exists(path)
+    elif impl == 'compressed_mmap':
+        return CompressedMMapIndexedDataset.exists(path)
     else:
         return IndexedDataset.exists(path)
 
@@ -328,6 +339,10 @@ class IndexedDatasetBuilder(object):
         index.close()
 
 
+# average item length (in elements) from which get_batch copies item by item
+_GATHER_ITEM_COPY_MIN_SIZE = 512
+
+
 def _warmup_mmap_file(path):
     with open(path, 'rb') as stream:
         while stream.read(100 * 1024 * 1024):
@@ -542,6 +557,55 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
         np_array = np.frombuffer(self._bin_buffer, dtype=self._index.dtype, count=length, offset=ptr)
         return np_array
 
+    def get_batch(self, indices):
+        """ Gathers the items at indices into one flat array.
+
+        Returns the flat array and an int64 array of len(indices) + 1 offsets,
+        item i being flat[offsets[i]:offsets[i + 1]]. Items are copied into a
+        single preallocated buffer instead of one np.frombuffer per item.
+        """
+        sizes, offsets = self._batch_offsets(indices)
+        flat = np.empty(int(offsets[-1]), dtype=self._index.dtype)
+        self._gather(indices, sizes, offsets, flat)
+        return flat, offsets
+
+    def get_packed_blocks(self, indices, block_length, pad_value=0, drop_last=False):
+        """ Concatenates the items at indices and cuts them into blocks of block_length.
+
+        Returns a (num_blocks, block_length) array and the offsets of the items
+        in the concatenated tokens, as in get_batch, so that item i covers
+        blocks.reshape(-1)[offsets[i]:offsets[i + 1]]. Items may span block
+        boundaries. The last partial block is filled with pad_value, or dropped
+        if drop_last is set.
+        """
+        sizes, offsets = self._batch_offsets(indices)
+        total_size = int(offsets[-1])
+        num_blocks = total_size // block_length if drop_last else -(-total_size // block_length)
+        buffer = np.empty(max(total_size, num_blocks * block_length), dtype=self._index.dtype)
+        self._gather(indices, sizes, offsets, buffer)
+        buffer[total_size:] = pad_value
+        return buffer[:num_blocks * block_length].reshape(num_blocks, block_length), offsets
+
+    def _batch_offsets(self, indices):
+        sizes = self._index._sizes[np.asarray(indices, dtype=np.int64).reshape(-1)].astype(np.int64)
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return sizes, offsets
+
+    def _gather(self, indices, sizes, offsets, out):
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        total_size = int(offsets[-1])
+        data = np.frombuffer(self._bin_buffer, dtype=self._index.dtype)
+        starts = self._index._pointers[indices] // np.dtype(self._index.dtype).itemsize
+        if total_size >= _GATHER_ITEM_COPY_MIN_SIZE * len(indices):
+            # long items, a copy per item is cheaper than materializing the positions
+            for i in range(len(indices)):
+                out[offsets[i]:offsets[i + 1]] = data[starts[i]:starts[i] + sizes[i]]
+        else:
+            positions = np.arange(total_size, dtype=np.int64)
+            positions += np.repeat(starts - offsets[:-1], sizes)
+            np.take(data, positions, out=out[:total_size])
+
     @property
     def sizes(self):
         return self._index.sizes
@@ -591,6 +655,14 @@ class MMapIndexedDatasetBuilder(object):
         self._data_file.write(np_array.tobytes(order='C'))
         self._sizes.append(np_array.size)
 
+    def add_items_numpy(self, np_array, sizes):
+        """Adds len(sizes) items whose elements are stored back to back in np_array."""
+        assert np_array.size == np.sum(sizes), "sizes do not add up to the number of elements"
+        if np_array.dtype != self._dtype:
+            np_array = np_array.astype(self._dtype)
+        self._data_file.write(np_array.tobytes(order='C'))
+        self._sizes.extend(np.asarray(sizes).tolist())
+
     def end_document(self):
         self._doc_idx.append(len(self._sizes))
 
@@ -615,3 +687,479 @@ class MMapIndexedDatasetBuilder(object):
 
         with MMapIndexedDataset.Index.writer(index_file, self._dtype) as index:
             index.write(self._sizes, self._doc_idx)
+
+
+def _copy_file_range(src_path, dst_path, dst_offset, count):
+    """Copies the first count bytes of src_path to dst_offset of dst_path, in the kernel when possible."""
+    with open(src_path, 'rb') as src, open(dst_path, 'r+b') as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        copied = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < count:
+                    n = os.copy_file_range(src_fd, dst_fd, count - copied, copied, dst_offset + copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                # e.g. not supported between these file systems
+                pass
+        if copied < count and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+                while copied < count:
+                    n = os.sendfile(dst_fd, src_fd, copied, count - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+        while copied < count:
+            chunk = os.pread(src_fd, min(count - copied, 64 * 1024 * 1024), copied)
+            assert len(chunk) > 0, f"{src_path} is shorter than its index"
+            copied += os.pwrite(dst_fd, chunk, dst_offset + copied)
+
+
+def merge_mmap_dataset_shards(shard_prefixes, out_prefix, num_threads=8, end_document=False):
+    """ Concatenates MMapIndexedDataset shards into one dataset at out_prefix.
+
+    The output layout is computed from the shard index files only, then the
+    shard data files are copied concurrently into their final offsets with
+    copy_file_range (sendfile, or plain reads and writes, where unavailable).
+    Both output files are written under temporary names and renamed, the index
+    last, so a reader never sees a partial dataset. The result matches merging
+    the shards one by one with MMapIndexedDatasetBuilder.merge_file_, plus a
+    trailing document boundary if end_document is set.
+    """
+    dtype = None
+    sizes = []
+    doc_idx = [np.zeros(1, dtype=np.int64)]
+    payloads = []
+    num_items = 0
+    num_bytes = 0
+    for prefix in shard_prefixes:
+        index = MMapIndexedDataset.Index(index_file_path(prefix), skip_warmup=True)
+        if dtype is None:
+            dtype = index.dtype
+        assert index.dtype == dtype, f"{prefix} has dtype {index.dtype}, expected {dtype}"
+        shard_bytes = int(np.sum(index.sizes, dtype=np.int64)) * np.dtype(dtype).itemsize
+        assert os.path.getsize(data_file_path(prefix)) >= shard_bytes, f"{data_file_path(prefix)} is incomplete"
+        sizes.append(np.array(index.sizes))
+        doc_idx.append(num_items + np.array(index.doc_idx[1:], dtype=np.int64))
+        payloads.append((data_file_path(prefix), num_bytes, shard_bytes))
+        num_items += len(index)
+        num_bytes += shard_bytes
+        del index
+    assert dtype is not None, "no shards to merge"
+    if end_document:
+        doc_idx.append(np.array([num_items], dtype=np.int64))
+
+    tmp_data_file = data_file_path(out_prefix) + '.tmp'
+    with open(tmp_data_file, 'wb') as f:
+        f.truncate(num_bytes)
+    with ThreadPoolExecutor(max_workers=max(1, num_threads)) as executor:
+        for future in [
+                executor.submit(_copy_file_range, path, tmp_data_file, offset, count)
+                for path, offset, count in payloads if count > 0
+        ]:
+            future.result()
+    os.replace(tmp_data_file, data_file_path(out_prefix))
+
+    tmp_index_file = index_file_path(out_prefix) + '.tmp'
+    with MMapIndexedDataset.Index.writer(tmp_index_file, dtype) as index:
+        index.write(np.concatenate(sizes), np.concatenate(doc_idx))
+    os.replace(tmp_index_file, index_file_path(out_prefix))
+
+
+class MMapIndexedDatasetShardedBuilder(object):
+    """ Builds one MMapIndexedDataset from shards written independently.
+
+    Each writer (e.g. a process) fills the builder returned by
+    shard_builder(shard_id) and finalizes it with finalize_shard, then merge()
+    concatenates the shards in shard id order. The object only holds paths and
+    can be passed to worker processes.
+    """
+
+    def __init__(self, out_prefix, num_shards, dtype=np.int64):
+        self.out_prefix = out_prefix
+        self.num_shards = num_shards
+        self.dtype = dtype
+
+    def shard_prefix(self, shard_id):
+        return f"{self.out_prefix}_shard{shard_id}"
+
+    def shard_builder(self, shard_id):
+        return MMapIndexedDatasetBuilder(data_file_path(self.shard_prefix(shard_id)), dtype=self.dtype)
+
+    def finalize_shard(self, builder, shard_id):
+        builder.finalize(index_file_path(self.shard_prefix(shard_id)))
+
+    def merge(self, num_threads=8, remove_shards=False):
+        shard_prefixes = [self.shard_prefix(shard_id) for shard_id in range(self.num_shards)]
+        merge_mmap_dataset_shards(shard_prefixes, self.out_prefix, num_threads=num_threads)
+        if remove_shards:
+            for prefix in shard_prefixes:
+                os.remove(data_file_path(prefix))
+                os.remove(index_file_path(prefix))
+
+
+# block codecs of CompressedMMapIndexedDataset
+COMPRESSION_CODECS = {'bitpack': 1, 'delta': 2, 'zlib': 3}
+# bit width recorded for blocks that are stored uncompressed
+_RAW_BLOCK_BITS = 255
+
+
+def _bitpack(values, bits):
+    """Pack unsigned values into bits bits each, little endian."""
+    if bits == 0:
+        return b''
+    shifts = np.arange(bits, dtype=np.uint64)
+    value_bits = ((values.astype(np.uint64)[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(value_bits.reshape(-1), bitorder='little').tobytes()
+
+
+def _bitunpack(buffer, count, bits):
+    if bits == 0:
+        return np.zeros(count, dtype=np.uint64)
+    if bits <= 56:
+        # assemble each value from the (at most 8) bytes it overlaps
+        num_bytes = (bits + 14) // 8
+        data = np.zeros(len(buffer) + num_bytes, dtype=np.uint8)
+        data[:len(buffer)] = np.frombuffer(buffer, dtype=np.uint8)
+        bit_offsets = np.arange(count, dtype=np.uint64) * np.uint64(bits)
+        byte_offsets = (bit_offsets >> np.uint64(3)).astype(np.int64)
+        values = np.zeros(count, dtype=np.uint64)
+        for k in range(num_bytes):
+            values |= data[byte_offsets + k].astype(np.uint64) << np.uint64(8 * k)
+        return (values >> (bit_offsets & np.uint64(7))) & np.uint64((1 << bits) - 1)
+    value_bits = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8), count=count * bits,
+                               bitorder='little').reshape(count, bits)
+    values = np.zeros(count, dtype=np.uint64)
+    for bit in range(bits):
+        values |= value_bits[:, bit].astype(np.uint64) << np.uint64(bit)
+    return values
+
+
+def _encode_block(block, codec):
+    """Returns the encoded bytes, the base value and the bit width of a block."""
+    if codec == 'zlib':
+        return zlib.compress(block.tobytes(), 1), 0, 0
+    values = block.astype(np.int64)
+    if codec == 'delta':
+        base = int(values[0])
+        deltas = np.diff(values)
+        # zigzag, so that small negative deltas take few bits
+        values = np.concatenate([[0], (deltas << 1) ^ (deltas >> 63)]).astype(np.uint64)
+    else:
+        base = int(values.min())
+        values = (values - base).astype(np.uint64)
+    bits = int(values.max()).bit_length()
+    if bits >= 8 * block.itemsize:
+        # packing would not save space
+        return block.tobytes(), 0, _RAW_BLOCK_BITS
+    return _bitpack(values, bits), base, bits
+
+
+def _decode_block(buffer, count, codec, base, bits, dtype):
+    if codec == 'zlib':
+        return np.frombuffer(zlib.decompress(buffer), dtype=dtype)
+    if bits == _RAW_BLOCK_BITS:
+        return np.frombuffer(buffer, dtype=dtype)
+    values = _bitunpack(buffer, count, bits)
+    if codec == 'delta':
+        deltas = (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+        values = np.cumsum(deltas) + base
+    else:
+        values = values.astype(np.int64) + base
+    return values.astype(dtype)
+
+
+class CompressedMMapIndexedDataset(torch.utils.data.Dataset):
+    """ MMapIndexedDataset variant whose data file holds compressed fixed-size blocks.
+
+    The items are concatenated into one stream of elements that is cut into
+    blocks of block_size elements, and each block is encoded on its own:
+
+    - bitpack: frame of reference, the block minimum is subtracted and values
+      are packed with the bit width of the block maximum.
+    - delta: zigzag-coded differences of consecutive values, bit packed, for
+      sorted data such as the index_to_sample outputs of the DataAnalyzer.
+    - zlib: zlib at its fastest level.
+
+    The index file holds the same sizes, pointers (in elements) and doc_idx as
+    the uncompressed index, plus the byte offset, base and bit width of each
+    block, so reading an item decodes only the blocks it spans. Decoded blocks
+    are kept in a LRU cache of cache_blocks blocks.
+    """
+
+    class Index(object):
+        _HDR_MAGIC = b'MMCIDX\x00\x00\x00'
+
+        @classmethod
+        def writer(cls, path, dtype, codec, block_size):
+
+            class _Writer(object):
+
+                def __enter__(self):
+                    self._file = open(path, 'wb')
+
+                    self._file.write(cls._HDR_MAGIC)
+                    self._file.write(struct.pack('<Q', 1))
+                    self._file.write(struct.pack('<B', code(dtype)))
+                    self._file.write(struct.pack('<B', COMPRESSION_CODECS[codec]))
+                    self._file.write(struct.pack('<Q', block_size))
+
+                    return self
+
+                def write(self, sizes, doc_idx, block_offsets, block_bases, block_bits):
+                    self._file.write(struct.pack('<Q', len(sizes)))
+                    self._file.write(struct.pack('<Q', len(doc_idx)))
+                    self._file.write(struct.pack('<Q', len(block_bases)))
+
+                    sizes = np.array(sizes, dtype=np.int64)
+                    self._file.write(sizes.astype(np.int32).tobytes(order='C'))
+                    pointers = np.zeros(len(sizes), dtype=np.int64)
+                    np.cumsum(sizes[:-1], out=pointers[1:])
+                    self._file.write(pointers.tobytes(order='C'))
+                    self._file.write(np.array(doc_idx, dtype=np.int64).tobytes(order='C'))
+
+                    self._file.write(np.array(block_offsets, dtype=np.int64).tobytes(order='C'))
+                    self._file.write(np.array(block_bases, dtype=np.int64).tobytes(order='C'))
+                    self._file.write(np.array(block_bits, dtype=np.uint8).tobytes(order='C'))
+
+                def __exit__(self, exc_type, exc_val, exc_tb):
+                    self._file.close()
+
+            return _Writer()
+
+        def __init__(self, path):
+            with open(path, 'rb') as stream:
+                magic_test = stream.read(9)
+                assert self._HDR_MAGIC == magic_test, 'Index file is not a compressed mmap index.'
+                version = struct.unpack('<Q', stream.read(8))
+                assert (1, ) == version
+
+                dtype_code, = struct.unpack('<B', stream.read(1))
+                self._dtype = dtypes[dtype_code]
+                codec_code, = struct.unpack('<B', stream.read(1))
+                self._codec = {v: k for k, v in COMPRESSION_CODECS.items()}[codec_code]
+                self._block_size = struct.unpack('<Q', stream.read(8))[0]
+
+                self._len = struct.unpack('<Q', stream.read(8))[0]
+                self._doc_count = struct.unpack('<Q', stream.read(8))[0]
+                self._num_blocks = struct.unpack('<Q', stream.read(8))[0]
+                offset = stream.tell()
+
+            self._bin_buffer_mmap = np.memmap(path, mode='r', order='C')
+            self._bin_buffer = memoryview(self._bin_buffer_mmap)
+            arrays = []
+            for dtype, count in [(np.int32, self._len), (np.int64, self._len), (np.int64, self._doc_count),
+                                 (np.int64, self._num_blocks + 1), (np.int64, self._num_blocks),
+                                 (np.uint8, self._num_blocks)]:
+                arrays.append(np.frombuffer(self._bin_buffer, dtype=dtype, count=count, offset=offset))
+                offset += arrays[-1].nbytes
+            (self._sizes, self._pointers, self._doc_idx, self._block_offsets, self._block_bases,
+             self._block_bits) = arrays
+
+        def __del__(self):
+            self._bin_buffer_mmap._mmap.close()
+            del self._bin_buffer_mmap
+
+        @property
+        def dtype(self):
+            return self._dtype
+
+        @property
+        def sizes(self):
+            return self._sizes
+
+        @property
+        def doc_idx(self):
+            return self._doc_idx
+
+        def __len__(self):
+            return self._len
+
+    def __init__(self, path, cache_blocks=64):
+        super().__init__()
+        self._cache_blocks = cache_blocks
+        self._do_init(path)
+
+    def __getstate__(self):
+        return self._path, self._cache_blocks
+
+    def __setstate__(self, state):
+        self._path, self._cache_blocks = state
+        self._do_init(self._path)
+
+    def _do_init(self, path):
+        self._path = path
+        self._index = self.Index(index_file_path(self._path))
+        self._bin_buffer_mmap = np.memmap(data_file_path(self._path), mode='r', order='C')
+        self._bin_buffer = memoryview(self._bin_buffer_mmap)
+        self._block_cache = OrderedDict()
+        self._num_elements = int(self._index._pointers[-1]) + int(self._index._sizes[-1]) if self._index._len else 0
+
+    def __del__(self):
+        self._bin_buffer_mmap._mmap.close()
+        del self._bin_buffer_mmap
+        del self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _get_block(self, block_id):
+        block = self._block_cache.get(block_id, None)
+        if block is not None:
+            self._block_cache.move_to_end(block_id)
+            return block
+        index = self._index
+        start, end = index._block_offsets[block_id], index._block_offsets[block_id + 1]
+        count = min(index._block_size, self._num_elements - block_id * index._block_size)
+        block = _decode_block(self._bin_buffer[start:end], count, index._codec, int(index._block_bases[block_id]),
+                              int(index._block_bits[block_id]), index.dtype)
+        # items are returned as views of the cached block
+        block.flags.writeable = False
+        self._block_cache[block_id] = block
+        if len(self._block_cache) > self._cache_blocks:
+            self._block_cache.popitem(last=False)
+        return block
+
+    def _read(self, start, length):
+        """Reads length elements from element offset start of the concatenated items."""
+        if length <= 0:
+            return np.empty(0, dtype=self._index.dtype)
+        block_size = self._index._block_size
+        first_block = start // block_size
+        last_block = (start + length - 1) // block_size
+        if first_block == last_block:
+            block_start = start - first_block * block_size
+            return self._get_block(first_block)[block_start:block_start + length]
+        out = np.empty(length, dtype=self._index.dtype)
+        filled = 0
+        for block_id in range(first_block, last_block + 1):
+            block = self._get_block(block_id)
+            block_start = max(start - block_id * block_size, 0)
+            count = min(len(block) - block_start, length - filled)
+            out[filled:filled + count] = block[block_start:block_start + count]
+            filled += count
+        return out
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            return self._read(int(self._index._pointers[idx]), int(self._index._sizes[idx]))
+        elif isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError("Slices into indexed_dataset must be contiguous")
+            sizes = self._index._sizes[idx]
+            if len(sizes) == 0:
+                return []
+            np_array = self._read(int(self._index._pointers[start]), int(np.sum(sizes, dtype=np.int64)))
+            return np.split(np_array, np.cumsum(sizes[:-1]))
+
+    def get(self, idx, offset=0, length=None):
+        """ Retrieves a single item from the dataset with the option to only
+        return a portion of the item.
+
+        get(idx) is the same as [idx] but get() does not support slicing.
+        """
+        size = int(self._index._sizes[idx])
+        if length is None:
+            length = size - offset
+        return self._read(int(self._index._pointers[idx]) + offset, length)
+
+    @property
+    def sizes(self):
+        return self._index.sizes
+
+    def size(self, index):
+        return self._index.sizes[index]
+
+    @property
+    def doc_idx(self):
+        return self._index.doc_idx
+
+    @property
+    def supports_prefetch(self):
+        return False
+
+    @staticmethod
+    def exists(path):
+        return (os.path.exists(index_file_path(path)) and os.path.exists(data_file_path(path)))
+
+    @property
+    def dtype(self):
+        return self._index.dtype
+
+
+class CompressedMMapIndexedDatasetBuilder(object):
+
+    def __init__(self, out_file, dtype=np.int64, codec='bitpack', block_size=4096):
+        assert codec in COMPRESSION_CODECS, f"unknown codec {codec}, expected one of {list(COMPRESSION_CODECS)}"
+        self._data_file = open(out_file, 'wb')
+        self._dtype = dtype
+        self._codec = codec
+        self._block_size = block_size
+        self._sizes = []
+        self._doc_idx = [0]
+        self._pending = []
+        self._pending_size = 0
+        self._block_offsets = [0]
+        self._block_bases = []
+        self._block_bits = []
+
+    def _write_block(self, block):
+        buffer, base, bits = _encode_block(block, self._codec)
+        self._data_file.write(buffer)
+        self._block_offsets.append(self._block_offsets[-1] + len(buffer))
+        self._block_bases.append(base)
+        self._block_bits.append(bits)
+
+    def _append(self, np_array):
+        if np_array.dtype != self._dtype:
+            np_array = np_array.astype(self._dtype)
+        self._pending.append(np_array.reshape(-1))
+        self._pending_size += np_array.size
+        if self._pending_size >= self._block_size:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        if self._pending_size == 0:
+            return
+        data = np.concatenate(self._pending)
+        num_full = len(data) // self._block_size
+        for block_id in range(num_full):
+            self._write_block(data[block_id * self._block_size:(block_id + 1) * self._block_size])
+        rest = data[num_full * self._block_size:]
+        if final and len(rest) > 0:
+            self._write_block(rest)
+            rest = rest[:0]
+        self._pending = [rest]
+        self._pending_size = len(rest)
+
+    def add_item(self, tensor):
+        np_array = np.array(tensor.numpy(), dtype=self._dtype)
+        self._append(np_array)
+        self._sizes.append(np_array.size)
+
+    def add_item_numpy(self, np_array):
+        self._append(np_array)
+        self._sizes.append(np_array.size)
+
+    def add_items_numpy(self, np_array, sizes):
+        """Adds len(sizes) items whose elements are stored back to back in np_array."""
+        assert np_array.size == np.sum(sizes), "sizes do not add up to the number of elements"
+        self._append(np_array)
+        self._sizes.extend(np.asarray(sizes).tolist())
+
+    def end_document(self):
+        self._doc_idx.append(len(self._sizes))
+
+    def finalize(self, index_file):
+        self._flush(final=True)
+        self._data_file.close()
+
+        with CompressedMMapIndexedDataset.Index.writer(index_file, self._dtype, self._codec,
+                                                       self._block_size) as index:
+            index.write(self._sizes, self._doc_idx, self._block_offsets, self._block_bases, self._block_bits)
@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+"""
+Built-in metrics for DataAnalyzer that are computed with NumPy over whole chunks of an MMapIndexedDataset.
+
+A vectorized metric is called with the flat token array of a contiguous range of samples and the
+per-sample sizes of that range, and returns one value per sample (single_value_per_sample) or one
+array for the whole range (accumulate_value_over_samples).
+"""
+
+import numpy as np
+
+
+def per_sample_sum(values, sizes):
+    """Sum values over each sample of a flat chunk, allowing empty samples."""
+    cumsum = np.zeros(len(values) + 1, dtype=np.float64 if values.dtype.kind == 'f' else np.int64)
+    np.cumsum(values, out=cumsum[1:])
+    ends = np.cumsum(sizes)
+    return cumsum[ends] - cumsum[ends - sizes]
+
+
+class VectorizedMetric(object):
+    # whether the metric reads token ids or only the sample sizes
+    requires_tokens = True
+
+    def __call__(self, tokens, sizes):
+        raise NotImplementedError
+
+
+class SeqLenMetric(VectorizedMetric):
+    """Number of tokens per sample, read from the index without touching the data file."""
+    requires_tokens = False
+
+    def __call__(self, tokens, sizes):
+        return sizes.astype(np.int64)
+
+
+class TotalVocabFreqMetric(VectorizedMetric):
+    """Number of occurrences of each token id, to be used with accumulate_value_over_samples."""
+
+    def __init__(self, vocab_size):
+        self.vocab_size = vocab_size
+
+    def __call__(self, tokens, sizes):
+        return np.bincount(tokens, minlength=self.vocab_size).astype(np.int64)
+
+
+class VocabRarityMetric(VectorizedMetric):
+    """Sum of -log(p(token)) over the tokens of each sample, multiplied by scale and rounded.
+
+    Token probabilities come from vocab_freq, e.g. the output of TotalVocabFreqMetric.
+    """
+
+    def __init__(self, vocab_freq, scale=100):
+        vocab_freq = np.maximum(np.asarray(vocab_freq, dtype=np.float64), 1)
+        self.neg_log_prob = -np.log(vocab_freq / vocab_freq.sum())
+        self.scale = scale
+
+    def __call__(self, tokens, sizes):
+        rarity = per_sample_sum(self.neg_log_prob[tokens], sizes)
+        return np.rint(rarity * self.scale).astype(np.int64)
@@ -7,7 +7,7 @@ import math
 import numpy as np
 
 from deepspeed.utils import logger
-from .indexed_dataset import MMapIndexedDatasetBuilder
+from .indexed_dataset import MMapIndexedDatasetBuilder, merge_mmap_dataset_shards
 
 
 def find_fit_int_dtype(min_value, max_value):
@@ -44,6 +44,16 @@ def split_dataset(dataset, num_workers, worker_id, num_threads):
     return worker_splits, thread_splits
 
 
+def get_map_worker_thread_splits(num_samples, num_workers, num_threads):
+    """Return [worker_id, thread_id, start_idx, end_idx] of every map output, in sample order."""
+    map_worker_thread = []
+    for w_idx in range(num_workers):
+        _, thread_splits = split_dataset(range(num_samples), num_workers, w_idx, num_threads)
+        for t_idx in range(num_threads):
+            map_worker_thread.append([w_idx, t_idx, thread_splits[t_idx][0], thread_splits[t_idx][1]])
+    return map_worker_thread
+
+
 def create_mmap_dataset_builder(fname, dtype):
     logger.info(f"Creating mmap dataset builder at {fname}.")
     return MMapIndexedDatasetBuilder(f"{fname}.bin", dtype=dtype)
@@ -53,3 +63,63 @@ def close_mmap_dataset_builder(builder, fname):
     builder.end_document()
     builder.finalize(f"{fname}.idx")
     logger.info(f"Finalized mmap dataset builder at {fname}.")
+
+
+def merge_mmap_dataset_files(chunk_fnames, fname, num_threads=8):
+    """Concatenates finalized mmap datasets into fname, as close_mmap_dataset_builder would write it."""
+    logger.info(f"Merging {len(chunk_fnames)} mmap datasets into {fname}.")
+    merge_mmap_dataset_shards(chunk_fnames, fname, num_threads=num_threads, end_document=True)
+    logger.info(f"Finalized merged mmap dataset at {fname}.")
+
+
+def _mix64(x):
+    # splitmix64 finalizer, on python ints
+    x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+class FeistelPermutation(object):
+    """Seeded pseudorandom permutation of [0, size) that is evaluated on demand.
+
+    A balanced Feistel network permutes the smallest power-of-four domain that
+    covers size, and cycle walking maps it back into [0, size). Memory use is
+    independent of size, so a shuffled order can be read position by position
+    without materializing it.
+    """
+
+    def __init__(self, size, seed, num_rounds=4):
+        self.size = int(size)
+        self.half_bits = max(1, (max(self.size - 1, 1).bit_length() + 1) // 2)
+        self.half_mask = np.uint64((1 << self.half_bits) - 1)
+        self.round_keys = []
+        key = _mix64(int(seed) & 0xFFFFFFFFFFFFFFFF)
+        for _ in range(num_rounds):
+            key = _mix64(key)
+            self.round_keys.append(np.uint64(key))
+
+    def _round(self, right, key):
+        x = (right + key) * np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(29)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(32)
+        return x & self.half_mask
+
+    def _permute(self, x):
+        left = x >> np.uint64(self.half_bits)
+        right = x & self.half_mask
+        for key in self.round_keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << np.uint64(self.half_bits)) | right
+
+    def __call__(self, positions):
+        """Return the permuted value of every position in [0, size)."""
+        x = np.asarray(positions, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            x = self._permute(x)
+            outside = np.nonzero(x >= self.size)[0]
+            while len(outside) > 0:
+                x[outside] = self._permute(x[outside])
+                outside = outside[x[outside] >= self.size]
+        return x.astype(np.int64)
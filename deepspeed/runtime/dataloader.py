@@ -3,6 +3,11 @@
 
 # DeepSpeed Team
 
+import queue
+import threading
+import time
+
+import torch
 from torch.utils.data import DataLoader, RandomSampler
 from torch.utils.data.distributed import DistributedSampler
 from deepspeed.accelerator import get_accelerator
@@ -38,6 +43,135 @@ class RepeatingLoader:
         return batch
 
 
+class PrefetchLoader:
+
+    def __init__(self, loader, prefetch_batches=2, device=None, pin_memory=True, tput_timer=None):
+        """Wraps an iterable to fetch batches on a background thread ahead of their use.
+
+        Up to ``prefetch_batches`` batches are collated, pinned and copied to ``device``
+        while the current batch is being computed on. Copies to an accelerator are issued
+        on a side stream, and the consumer's stream waits for them only when the batch is
+        returned. Each iteration restarts ``loader``, so a ``RepeatingLoader`` can wrap a
+        ``PrefetchLoader``.
+
+        Args:
+            loader (iterable): The data loader to prefetch from.
+            prefetch_batches (int): Number of batches to keep ahead of the consumer.
+            device (torch.device, optional): Device to copy tensors to, tensors stay where
+                they are if None.
+            pin_memory (bool): Pin host tensors before copying them to an accelerator.
+            tput_timer (ThroughputTimer, optional): Timer to report the time spent waiting
+                for data to.
+        """
+        assert prefetch_batches > 0, f"prefetch_batches must be positive, got {prefetch_batches}"
+        self.loader = loader
+        self.prefetch_batches = prefetch_batches
+        self.device = None if device is None else torch.device(device)
+        self.pin_memory = pin_memory
+        self.tput_timer = tput_timer
+        self.copy_stream = None
+        if self.device is not None and self.device.type != 'cpu':
+            self.copy_stream = get_accelerator().Stream()
+        self.queue = None
+        self.thread = None
+        self.stop_event = None
+        self.data_wait_time = 0.0
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.close()
+        self.queue = queue.Queue(maxsize=self.prefetch_batches)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._prefetch,
+                                       args=(iter(self.loader), self.queue, self.stop_event),
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def __next__(self):
+        if self.thread is None:
+            raise StopIteration
+        start = time.time()
+        batch, event, error = self.queue.get()
+        wait_time = time.time() - start
+        self.data_wait_time += wait_time
+        if self.tput_timer:
+            self.tput_timer.add_data_wait_time(wait_time)
+        if error is not None:
+            self.close()
+            raise error
+        if event is not None:
+            get_accelerator().current_stream().wait_event(event)
+            self._record_stream(batch, get_accelerator().current_stream())
+        return batch
+
+    def close(self):
+        """Stop the prefetch thread of the current iteration, if any."""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        # unblock a producer waiting on a full queue
+        while self.thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                self.thread.join(timeout=0.01)
+        self.thread = None
+        self.queue = None
+
+    def _put(self, output_queue, stop_event, item):
+        while not stop_event.is_set():
+            try:
+                output_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _prefetch(self, data_iter, output_queue, stop_event):
+        while not stop_event.is_set():
+            try:
+                batch = next(data_iter)
+                event = None
+                if self.copy_stream is not None:
+                    with get_accelerator().stream(self.copy_stream):
+                        batch = self._to_device(batch)
+                        event = get_accelerator().Event()
+                        event.record(self.copy_stream)
+                elif self.device is not None:
+                    batch = self._to_device(batch)
+                item = (batch, event, None)
+            except Exception as e:
+                # StopIteration included, raised to the consumer in order
+                item = (None, None, e)
+            if not self._put(output_queue, stop_event, item) or item[2] is not None:
+                return
+
+    def _to_device(self, data):
+        if isinstance(data, torch.Tensor):
+            if self.copy_stream is not None and self.pin_memory and data.device.type == 'cpu' and not data.is_pinned():
+                data = get_accelerator().pin_memory(data)
+            return data.to(self.device, non_blocking=True)
+        if isinstance(data, (list, tuple)):
+            moved = [self._to_device(x) for x in data]
+            return type(data)(*moved) if hasattr(data, '_fields') else type(data)(moved)
+        if isinstance(data, dict):
+            return type(data)({k: self._to_device(v) for k, v in data.items()})
+        return data
+
+    def _record_stream(self, data, stream):
+        if isinstance(data, torch.Tensor):
+            data.record_stream(stream)
+        elif isinstance(data, (list, tuple)):
+            for x in data:
+                self._record_stream(x, stream)
+        elif isinstance(data, dict):
+            for x in data.values():
+                self._record_stream(x, stream)
+
+
 class DeepSpeedDataLoader(object):
 
     def __init__(self,
@@ -52,7 +186,9 @@ class DeepSpeedDataLoader(object):
                  data_parallel_world_size=None,
                  data_parallel_rank=None,
                  dataloader_drop_last=False,
-                 deepspeed_dataloader_config={}):
+                 deepspeed_dataloader_config={},
+                 prefetch_batches=0,
+                 device=None):
         self.deepspeed_dataloader_config = deepspeed_dataloader_config
         self.tput_timer = tput_timer
         self.batch_size = batch_size
@@ -98,6 +234,9 @@ class DeepSpeedDataLoader(object):
         self.data = None
         self.dataloader_drop_last = dataloader_drop_last
         self.post_process_func = None
+        self.prefetch_batches = prefetch_batches
+        self.device = device
+        self.prefetcher = None
 
         if self.dataloader_drop_last:
             self.len = len(self.data_sampler) // self.batch_size
@@ -136,7 +275,7 @@ class DeepSpeedDataLoader(object):
                                              batch_sampler=self.data_sampler,
                                              collate_fn=self.collate_fn,
                                              num_workers=self.num_local_io_workers)
-            self.data_iterator = iter(self.dataloader)
+            self.data_iterator = iter(self._prefetch(self.dataloader))
             return self.dataloader
         else:
             if self.collate_fn is None:
@@ -154,9 +293,22 @@ class DeepSpeedDataLoader(object):
                                              collate_fn=self.collate_fn,
                                              num_workers=self.num_local_io_workers,
                                              drop_last=self.dataloader_drop_last)
-            self.data = (x for x in self.dataloader)
+            self.data = (x for x in self._prefetch(self.dataloader))
 
             return self.dataloader
 
+    def _prefetch(self, dataloader):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+        if self.prefetch_batches <= 0:
+            return dataloader
+        self.prefetcher = PrefetchLoader(dataloader,
+                                         prefetch_batches=self.prefetch_batches,
+                                         device=self.device,
+                                         pin_memory=self.pin_memory,
+                                         tput_timer=self.tput_timer)
+        return self.prefetcher
+
 
 # DataLoader([(torch.randn(3, 3), torch.tensor(i % 2)) for i in range(10)], batch_size=2))
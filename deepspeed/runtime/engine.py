@@ -1635,6 +1635,9 @@ class DeepSpeedEngine(Module):
     def dataloader_drop_last(self):
         return self._config.dataloader_drop_last
 
+    def dataloader_prefetch_batches(self):
+        return self._config.dataloader_prefetch_batches
+
     def was_step_applied(self) -> bool:
         """Returns True if the latest ``step()`` produced in parameter updates.
         Note that a ``False`` return is not an error condition. Steps are frequently
@@ -1704,7 +1707,9 @@ class DeepSpeedEngine(Module):
                                    data_parallel_world_size=data_parallel_world_size,
                                    data_parallel_rank=data_parallel_rank,
                                    dataloader_drop_last=self.dataloader_drop_last(),
-                                   deepspeed_dataloader_config=deepspeed_dataloader_config)
+                                   deepspeed_dataloader_config=deepspeed_dataloader_config,
+                                   prefetch_batches=self.dataloader_prefetch_batches(),
+                                   device=self.device)
 
     def train(self, mode=True):
         r""""""
@@ -2145,6 +2150,9 @@ class DeepSpeedEngine(Module):
                             ))
                     self.monitor.write_events(self.summary_events)
 
+        if self.is_gradient_accumulation_boundary():
+            dist.check_stragglers(self.global_samples, self.monitor if self.monitor.enabled else None)
+
         # Check flops profiling
         if flops_profiler_active:
             if self.autotuning_enabled():
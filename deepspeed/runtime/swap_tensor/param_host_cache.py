@@ -0,0 +1,187 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+"""
+Host memory tier for partitioned parameters swapped to (NVMe) storage devices.
+"""
+
+import bisect
+import torch
+from deepspeed.accelerator import get_accelerator
+
+
+class PartitionedParamHostCache(object):
+    """Bounded host-memory cache that sits between the swap buffers and NVMe.
+
+    The cache is inclusive and write-through: NVMe always holds the latest copy of
+    every partition, and the cache keeps a subset of the partitions resident so
+    that swap-ins of hot partitions can be served by a host memcpy instead of an
+    aio read.
+
+    Eviction uses the parameter trace recorded by ``PartitionedParameterCoordinator``
+    when one is registered: the resident partition whose next use is furthest away
+    is evicted first, and a partition is only admitted if it will be reused sooner
+    than the partitions it would displace. Without a trace, eviction falls back to
+    least recently used.
+    """
+
+    def __init__(self, max_numel, dtype, pin_memory=False):
+        self.max_numel = max_numel
+        self.dtype = dtype
+        self.pin_memory = pin_memory
+        self.element_size = torch.tensor([], dtype=dtype).element_size()
+
+        # mapping from param id to cached host tensor
+        self.entries = {}
+        self.cached_numel = 0
+
+        # LRU bookkeeping, used when no trace is available
+        self.clock = 0
+        self.last_access = {}
+
+        # trace bookkeeping: owner -> (param id -> sorted step ids, trace length)
+        self.traces = {}
+        self.active_owner = None
+        self.trace_step = 0
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.bytes_from_cache = 0
+        self.bytes_from_disk = 0
+        self.evictions = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups > 0 else 0.0,
+            'bytes_from_cache': self.bytes_from_cache,
+            'bytes_from_disk': self.bytes_from_disk,
+            'evictions': self.evictions,
+            'cached_numel': self.cached_numel,
+        }
+
+    def set_access_trace(self, owner, param_steps, trace_length):
+        """Register the (param id, step id) access order of a complete trace."""
+        positions = {}
+        for param_id, step_id in param_steps:
+            positions.setdefault(param_id, []).append(step_id)
+        for steps in positions.values():
+            steps.sort()
+        self.traces[owner] = (positions, max(trace_length, 1))
+        self.active_owner = owner
+
+    def clear_access_trace(self, owner):
+        self.traces.pop(owner, None)
+        if self.active_owner == owner:
+            self.active_owner = None
+
+    def set_trace_step(self, owner, step_id):
+        """Record the current position of ``owner`` in its trace."""
+        if owner in self.traces:
+            self.active_owner = owner
+            self.trace_step = step_id
+
+    def _reuse_distance(self, param_id):
+        if self.active_owner is None:
+            return self.clock - self.last_access.get(param_id, -1)
+
+        positions, trace_length = self.traces[self.active_owner]
+        steps = positions.get(param_id, None)
+        if not steps:
+            # never used by the active trace, always the coldest
+            return 2 * trace_length
+        next_index = bisect.bisect_right(steps, self.trace_step)
+        if next_index < len(steps):
+            return steps[next_index] - self.trace_step
+        return steps[0] + trace_length - self.trace_step
+
+    def _touch(self, param_id):
+        self.clock += 1
+        self.last_access[param_id] = self.clock
+
+    def contains(self, param_id):
+        return param_id in self.entries
+
+    def lookup(self, param_id, numel):
+        """Return the cached tensor for ``param_id``, accounting a hit or a disk read."""
+        tensor = self.entries.get(param_id, None)
+        if tensor is None:
+            self.misses += 1
+            self.bytes_from_disk += numel * self.element_size
+            return None
+
+        self.hits += 1
+        self.bytes_from_cache += numel * self.element_size
+        self._touch(param_id)
+        return tensor
+
+    def _select_victims(self, param_id, numel):
+        needed = self.cached_numel + numel - self.max_numel
+        if needed <= 0:
+            return []
+
+        # without a trace the candidate is the most recently used partition
+        candidate_distance = self._reuse_distance(param_id) if self.active_owner is not None else 0
+        ranked = sorted(((self._reuse_distance(pid), pid) for pid in self.entries), reverse=True)
+        victims = []
+        for distance, victim_id in ranked:
+            if needed <= 0:
+                break
+            if distance <= candidate_distance:
+                # remaining entries are reused sooner than the candidate
+                return None
+            victims.append(victim_id)
+            needed -= self.entries[victim_id].numel()
+
+        return victims if needed <= 0 else None
+
+    def insert(self, param_id, src_tensor):
+        """Copy ``src_tensor`` into the cache if it is hot enough to be admitted."""
+        numel = src_tensor.numel()
+        if param_id in self.entries:
+            self.entries[param_id].copy_(src_tensor.view(-1))
+            self._touch(param_id)
+            return True
+
+        if numel > self.max_numel:
+            return False
+
+        victims = self._select_victims(param_id, numel)
+        if victims is None:
+            return False
+
+        cache_tensor = None
+        for victim_id in victims:
+            victim = self.evict(victim_id)
+            self.evictions += 1
+            if cache_tensor is None and victim.numel() == numel:
+                cache_tensor = victim
+
+        if cache_tensor is None:
+            cache_tensor = torch.empty(numel, dtype=self.dtype, device='cpu')
+            if self.pin_memory:
+                cache_tensor = get_accelerator().pin_memory(cache_tensor)
+
+        cache_tensor.copy_(src_tensor.view(-1))
+        self.entries[param_id] = cache_tensor
+        self.cached_numel += numel
+        self._touch(param_id)
+        return True
+
+    def update(self, param_id, src_tensor):
+        """Write-through update of a resident entry; no-op if ``param_id`` is not cached."""
+        if param_id in self.entries:
+            self.entries[param_id].copy_(src_tensor.view(-1))
+
+    def evict(self, param_id):
+        tensor = self.entries.pop(param_id, None)
+        if tensor is not None:
+            self.cached_numel -= tensor.numel()
+            self.last_access.pop(param_id, None)
+        return tensor
@@ -13,7 +13,9 @@ import torch
 from deepspeed import comm as dist
 from deepspeed.accelerator import get_accelerator
 from deepspeed.ops.op_builder import AsyncIOBuilder
+from deepspeed.utils.logging import logger
 from .constants import *
+from .param_host_cache import PartitionedParamHostCache
 from .utils import swap_in_tensors, swap_out_tensors, MIN_AIO_BYTES, AIO_ALIGNED_BYTES, print_object, SwapBufferPool
 
 
@@ -74,6 +76,13 @@ class AsyncPartitionedParameterSwapper(object):
 
         self.invalid_buffer = torch.tensor(1).half()
 
+        # host memory tier between the swap buffers and nvme
+        self.host_cache = None
+        if self.swap_config.host_cache_size > 0:
+            self.host_cache = PartitionedParamHostCache(max_numel=self.swap_config.host_cache_size,
+                                                        dtype=self.dtype,
+                                                        pin_memory=self.swap_config.pin_memory)
+
         if dist.get_rank() == 0:
             exclude_list = ['aio_read_handle', 'aio_write_handle', 'buffers']
             print_object(obj=self, name='AsyncPartitionedParameterSwapper', exclude_list=exclude_list)
@@ -230,6 +239,12 @@ class AsyncPartitionedParameterSwapper(object):
 
                 assert buffer_id is not None, "Missing buffer id for releasing"
 
+                # partition matches its nvme copy here, keep it in host memory if it is hot
+                if self.host_cache is not None and param.ds_tensor.status == PartitionedParamStatus.AVAILABLE:
+                    self.host_cache.insert(
+                        param_id, self.param_id_to_swap_buffer[param_id].narrow(0, 0,
+                                                                                self.param_id_to_numel[param_id]))
+
                 self.available_buffer_ids.append(buffer_id)
                 del self.param_id_to_buffer_id[param_id]
                 del self.param_id_to_swap_buffer[param_id]
@@ -249,6 +264,10 @@ class AsyncPartitionedParameterSwapper(object):
         swap_out_params = self._get_swap_buffers(params)
         self._track_numel(params)
 
+        if self.host_cache is not None:
+            for param, swap_buffer in zip(params, swap_out_params):
+                self.host_cache.update(param.ds_id, swap_buffer.narrow(0, 0, self.param_id_to_numel[param.ds_id]))
+
         swap_out_tensors(self.aio_write_handle, swap_out_params, swap_out_paths)
 
         self.pending_writes += len(swap_out_params)
@@ -279,6 +298,14 @@ class AsyncPartitionedParameterSwapper(object):
 
         assert all([param.ds_tensor.status == PartitionedParamStatus.NOT_AVAILABLE
                     for param in params]), "Some params are already available or in flight"
+
+        if self.host_cache is not None:
+            params, swap_in_buffers = self._swap_in_from_host_cache(params, swap_in_buffers)
+            if len(params) == 0:
+                if not async_op:
+                    self.synchronize_reads()
+                return
+
         swap_in_paths = self._get_swap_paths(params)
 
         if swap_in_buffers is None:
@@ -309,10 +336,46 @@ class AsyncPartitionedParameterSwapper(object):
         if not async_op:
             self.synchronize_reads()
 
+    #serves cached partitions with host copies, returns the params (and buffers) that must be read from nvme
+    def _swap_in_from_host_cache(self, params, swap_in_buffers):
+        missed_params = []
+        missed_buffers = []
+        for i, param in enumerate(params):
+            param_id = param.ds_id
+            numel = self.param_id_to_numel[param_id]
+            cached_tensor = self.host_cache.lookup(param_id, numel)
+            if cached_tensor is None:
+                missed_params.append(param)
+                if swap_in_buffers is not None:
+                    missed_buffers.append(swap_in_buffers[i])
+                continue
+
+            if swap_in_buffers is None:
+                compute_buffers, _ = self._allocate_and_return_buffers_for_swap_in([param])
+                compute_buffer = compute_buffers[0]
+            else:
+                compute_buffer = swap_in_buffers[i].narrow(0, 0, numel)
+
+            compute_buffer.data.copy_(cached_tensor)
+            param.ds_tensor.data = compute_buffer.data
+            param.ds_tensor.status = PartitionedParamStatus.AVAILABLE
+            self.available_params.add(param_id)
+            self.available_numel += numel
+
+        return missed_params, (missed_buffers if swap_in_buffers is not None else None)
+
     # Enables swapping into buffer that is out the control of swapper. This is always synchronous
     def swap_into_buffer(self, param, dest_buffer):
         assert param.ds_tensor.status == PartitionedParamStatus.NOT_AVAILABLE, f"param {param.ds_id} is already available or inflight"
 
+        if self.host_cache is not None:
+            cached_tensor = self.host_cache.lookup(param.ds_id, dest_buffer.numel())
+            # partition will live in dest_buffer from now on, so it no longer needs a cache entry
+            self.host_cache.evict(param.ds_id)
+            if cached_tensor is not None:
+                dest_buffer.data.copy_(cached_tensor)
+                return
+
         require_swap_buffer = not (dest_buffer.is_pinned() and self._is_io_aligned(dest_buffer.numel()))
 
         if require_swap_buffer:
@@ -333,6 +396,8 @@ class AsyncPartitionedParameterSwapper(object):
             dest_buffer.data.copy_(param.ds_tensor.data)
             # Release swap buffer memory assignment. Note, this will mark the parameter not available.
             self.remove_partition_and_release_buffers([param])
+            if self.host_cache is not None:
+                self.host_cache.evict(param.ds_id)
 
     #assign a buffer to a param and return the buffer
     def get_buffer(self, param, numel):
@@ -392,12 +457,27 @@ class AsyncPartitionedParameterSwapper(object):
         self.synchronize_writes()
         self.partitioned_swap_pool.reset()
         for i, fp32_tensor in enumerate(src_fp32_params):
-            swap_tensor, _ = self.partitioned_swap_pool.insert_tensor(fp32_tensor, fp16_swap_paths[i],
-                                                                      self._io_aligned_numel(fp32_tensor.numel()))
+            swap_tensor, compute_tensor = self.partitioned_swap_pool.insert_tensor(
+                fp32_tensor, fp16_swap_paths[i], self._io_aligned_numel(fp32_tensor.numel()))
             assert swap_tensor is not None
+            if self.host_cache is not None:
+                self.host_cache.update(dst_fp16_params[i].ds_id, compute_tensor)
             dst_fp16_params[i].ds_tensor.status = PartitionedParamStatus.AVAILABLE
 
         self.partitioned_swap_pool.swap_out(self.aio_write_handle)
 
         for param in dst_fp16_params:
             param.ds_tensor.status = PartitionedParamStatus.NOT_AVAILABLE
+
+    def log_host_cache_stats(self):
+        if self.host_cache is None:
+            return
+
+        stats = self.host_cache.get_stats()
+        if dist.get_rank() == 0:
+            logger.info(
+                f"nvme param host cache: hit_rate = {stats['hit_rate']:.3f}, hits = {stats['hits']}, "
+                f"misses = {stats['misses']}, read from cache (GB) = {stats['bytes_from_cache'] / 1024**3:.2f}, "
+                f"read from disk (GB) = {stats['bytes_from_disk'] / 1024**3:.2f}, "
+                f"evictions = {stats['evictions']}, cached numel = {stats['cached_numel']}")
+        self.host_cache.reset_stats()
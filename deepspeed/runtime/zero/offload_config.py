@@ -46,6 +46,14 @@ class DeepSpeedZeroOffloadParamConfig(DeepSpeedConfigModel):
     of extra memory overhead.
     """
 
+    host_cache_size: int = Field(0, ge=0)
+    """
+    Number of parameter elements to keep in a host memory cache between the
+    swap buffers and NVMe when offloading to NVMe is enabled. Partitions that
+    are reused soonest according to the recorded parameter trace stay cached,
+    the rest are read from NVMe. A value of 0 disables the cache.
+    """
+
 
 class DeepSpeedZeroOffloadOptimizerConfig(DeepSpeedConfigModel):
     """ Set options for optimizer offload. Valid with stage 1, 2, and 3. """
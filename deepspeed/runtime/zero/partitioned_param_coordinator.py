@@ -124,6 +124,8 @@ class PartitionedParameterCoordinator:
         # TODO. make this configurable via JSON
         self.__max_ongoing_fetch_events: int = 2
         self.__profiler = PartitionedParameterProfiler(timers if ENABLE_PROFILER else None)
+        # host memory tier of the nvme param swapper, ordered by the recorded trace
+        self.__nvme_host_cache = None
 
     """Tracing and Tracking
     TODO. consider performing trace before initializing PartitionedParameterCoordinator
@@ -154,6 +156,9 @@ class PartitionedParameterCoordinator:
             raise RuntimeError("attempted to invalidate already invalid trace")
         self.__trace_mode = ZeRoTraceMode.INVALID
         self._clear_trace_structures()
+        if self.__nvme_host_cache is not None:
+            self.__nvme_host_cache.clear_access_trace(owner=id(self))
+            self.__nvme_host_cache = None
 
     def trace_prologue(self, sub_module: Module) -> None:
         if self.is_complete_trace():
@@ -197,6 +202,18 @@ class PartitionedParameterCoordinator:
         for sub_module in self.__submodule_order:
             self.record_parameters(sub_module)
 
+    def _register_trace_with_nvme_host_cache(self) -> None:
+        """let the nvme host cache order its evictions by the recorded parameter trace"""
+        for param_in_trace in self.__param_order:
+            swapper = getattr(param_in_trace.param, 'nvme_swapper', None)
+            if swapper is not None and swapper.host_cache is not None:
+                self.__nvme_host_cache = swapper.host_cache
+                self.__nvme_host_cache.set_access_trace(owner=id(self),
+                                                        param_steps=[(p.param.ds_id, p.step_id_last_used_at)
+                                                                     for p in self.__param_order],
+                                                        trace_length=len(self.__submodule_order))
+                return
+
     def reset_step(self) -> None:
         """indicate that we have completed one fwd+bwd for the model"""
         if self.__inflight_param_registry:
@@ -217,6 +234,7 @@ class PartitionedParameterCoordinator:
                 self.__submodule_order = tuple(self.__submodule_order)  # freeze
                 self.__param_order = tuple(self.__param_order)  # freeze
                 self.__trace_mode = ZeRoTraceMode.COMPLETE
+                self._register_trace_with_nvme_host_cache()
                 print_rank_0(
                     f"completed record trace of {len(self.__submodule_order)} sub modules: {[m.id for m in self.__submodule_order]}",
                     force=False)
@@ -268,6 +286,9 @@ class PartitionedParameterCoordinator:
                     "inflight": [p.ds_id for p in self.__inflight_param_registry],
                 }))
 
+        if self.__nvme_host_cache is not None:
+            self.__nvme_host_cache.set_trace_step(owner=id(self), step_id=self.__step_id)
+
         params_to_fetch = frozenset(iter_params(current_submodule))
         fetch_numel = sum(
             [p.partition_numel() for p in params_to_fetch if p.ds_status == ZeroParamStatus.NOT_AVAILABLE])
@@ -1852,6 +1852,9 @@ class DeepSpeedZeroOptimizer_Stage3(ZeROOptimizer):
         if self.swap_optimizer:
             self.optimizer_swapper.log_timers()
 
+        if self.params_in_nvme_and_cpu:
+            self.fp16_groups[0][0].nvme_swapper.log_host_cache_stats()
+
         self.invalidate_secondary_tensor()
 
         self.timers.log(timer_names)
@@ -13,5 +13,5 @@ from .nvtx import instrument_w_nvtx
 from .tensor_fragment import tensor_fragment, get_full_hp_param, get_hp_fragment_mapping, fragment_address, get_full_hp_grad
 from .tensor_fragment import safe_get_full_fp32_param, safe_get_full_grad, safe_get_full_optimizer_state
 from .mixed_precision_linkage import link_hp_params
-from deepspeed.runtime.dataloader import RepeatingLoader
+from deepspeed.runtime.dataloader import RepeatingLoader, PrefetchLoader
 from .numa import get_numactl_cmd
@@ -3,7 +3,11 @@
 
 # DeepSpeed Team
 
+import json
 import math
+import os
+import time
+import numpy as np
 from deepspeed.utils import log_dist
 
 
@@ -67,13 +71,29 @@ def calc_bw_log(comm_op, size, duration):
 class CommsLogger:
 
     def __init__(self):
-        from deepspeed.comm.constants import COMMS_LOGGER_VERBOSE_DEFAULT, COMMS_LOGGER_DEBUG_DEFAULT, COMMS_LOGGER_PROF_OPS_DEFAULT, COMMS_LOGGER_PROF_ALL_DEFAULT, COMMS_LOGGER_ENABLED_DEFAULT
+        from deepspeed.comm.constants import COMMS_LOGGER_VERBOSE_DEFAULT, COMMS_LOGGER_DEBUG_DEFAULT, COMMS_LOGGER_PROF_OPS_DEFAULT, COMMS_LOGGER_PROF_ALL_DEFAULT, COMMS_LOGGER_ENABLED_DEFAULT, COMMS_LOGGER_TRACE_DEFAULT, COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT
         self.comms_dict = {}
         self.verbose = COMMS_LOGGER_VERBOSE_DEFAULT
         self.debug = COMMS_LOGGER_DEBUG_DEFAULT
         self.prof_ops = COMMS_LOGGER_PROF_OPS_DEFAULT
         self.prof_all = COMMS_LOGGER_PROF_ALL_DEFAULT
         self.enabled = COMMS_LOGGER_ENABLED_DEFAULT
+        self.trace_buffer_size = COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT
+        self.tracer = None
+        self.trace = COMMS_LOGGER_TRACE_DEFAULT
+        self.straggler_detector = None
+
+    @property
+    def trace(self):
+        return self.tracer is not None
+
+    @trace.setter
+    def trace(self, trace):
+        # In trace mode ops are recorded into a CommsTracer instead of being synchronized and timed
+        if not trace:
+            self.tracer = None
+        elif self.tracer is None or self.tracer.buffer_size != self.trace_buffer_size:
+            self.tracer = CommsTracer(self.trace_buffer_size)
 
     def configure(self, comms_config):
         self.enabled = comms_config.comms_logger_enabled
@@ -82,6 +102,14 @@ class CommsLogger:
             self.debug = comms_config.comms_logger.debug
             self.prof_ops = comms_config.comms_logger.prof_ops
             self.prof_all = comms_config.comms_logger.prof_all
+            self.trace_buffer_size = comms_config.comms_logger.trace_buffer_size
+            self.trace = comms_config.comms_logger.trace
+            if comms_config.comms_logger.straggler_detection:
+                self.straggler_detector = StragglerDetector(
+                    interval=comms_config.comms_logger.straggler_interval,
+                    threshold_ms=comms_config.comms_logger.straggler_threshold_ms,
+                    patience=comms_config.comms_logger.straggler_patience,
+                    max_samples=comms_config.comms_logger.straggler_max_samples)
 
     # There are three settings for the op profiler:
     # - Global profiling (profile all comms)
@@ -128,6 +156,9 @@ class CommsLogger:
         from deepspeed.utils.timer import trim_mean
         import deepspeed.comm as dist
         from deepspeed.comm.reduce_op import ReduceOp
+        if self.trace:
+            self.log_trace(print_log)
+            return
         if print_log:
             print(
                 f"{'Comm. Op': <20}{'Message Size': <20}{'Count': <20}{'Total Latency(ms)': <20}{'Avg Latency(ms)': <20}{'tput_avg (Gbps)': <20}{'busbw_avg (Gbps)': <20}"
@@ -176,3 +207,329 @@ class CommsLogger:
                         print(
                             f"{' ': <20}{convert_size(msg_size): <20}{count: <20}{total_lat: <20.2f}{total_straggler: <20.2f}{avg_lat: <20.2f}{avg_straggler: <20.2f}"
                         )
+
+    # Print latency percentiles of the records in the trace buffer
+    def log_trace(self, print_log=True):
+        stats = self.tracer.get_percentiles()
+        if not print_log:
+            return
+        print(
+            f"{'Comm. Op': <20}{'Message Size': <20}{'Count': <20}{'Avg Latency(ms)': <20}{'p50 (ms)': <20}{'p90 (ms)': <20}{'p99 (ms)': <20}{'Max Latency(ms)': <20}"
+        )
+        for record_name, sizes in stats.items():
+            print(record_name)
+            for msg_size, vals in sorted(sizes.items()):
+                print(
+                    f"{' ': <20}{convert_size(msg_size): <20}{vals['count']: <20}{vals['mean']: <20.2f}{vals['p50']: <20.2f}{vals['p90']: <20.2f}{vals['p99']: <20.2f}{vals['max']: <20.2f}"
+                )
+
+
+class CommsTracer:
+    """Fixed-size ring buffer of communication op records for low overhead tracing.
+
+    Each record holds the op name, message size, process group and host launch
+    timestamps of one op. Nothing is synchronized when an op is recorded: when the
+    accelerator supports timing events, a start/end event pair is recorded around
+    the op and only resolved when the trace is read or when the slot is reused,
+    otherwise the host timestamps are used. Once the buffer is full the oldest
+    records are overwritten.
+    """
+
+    def __init__(self, buffer_size=None, use_events=None):
+        from deepspeed.comm.constants import COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT
+        from deepspeed.accelerator import get_accelerator
+        self.buffer_size = buffer_size or COMMS_LOGGER_TRACE_BUFFER_SIZE_DEFAULT
+        if use_events is None:
+            use_events = get_accelerator().Event is not None and get_accelerator().is_available()
+        self.use_events = use_events
+
+        self.op_ids = np.zeros(self.buffer_size, dtype=np.int32)
+        self.group_ids = np.zeros(self.buffer_size, dtype=np.int32)
+        self.msg_sizes = np.zeros(self.buffer_size, dtype=np.int64)
+        self.start_ns = np.zeros(self.buffer_size, dtype=np.int64)
+        self.end_ns = np.zeros(self.buffer_size, dtype=np.int64)
+        # -1 until the device events of a record are resolved
+        self.duration_ns = np.zeros(self.buffer_size, dtype=np.int64)
+        # event pairs are created on first use of a slot and reused afterwards
+        self.events = [None] * self.buffer_size
+        self.pending = np.zeros(self.buffer_size, dtype=bool)
+
+        self.op_names = []
+        self.op_index = {}
+        self.group_names = []
+        self.group_index = {}
+        self.num_records = 0
+
+    def reset(self):
+        self.pending[:] = False
+        self.num_records = 0
+
+    def __len__(self):
+        return min(self.num_records, self.buffer_size)
+
+    def _intern_op(self, op_name):
+        op_id = self.op_index.get(op_name)
+        if op_id is None:
+            op_id = self.op_index[op_name] = len(self.op_names)
+            self.op_names.append(op_name)
+        return op_id
+
+    def _intern_group(self, group):
+        group_id = self.group_index.get(group)
+        if group_id is None:
+            group_id = self.group_index[group] = len(self.group_names)
+            self.group_names.append("world" if group is None else f"group_{group_id}")
+        return group_id
+
+    def start(self, op_name, msg_size, group=None):
+        """Record the launch of an op and return its slot, to be passed to ``stop``."""
+        slot = self.num_records % self.buffer_size
+        self.num_records += 1
+        if self.pending[slot]:
+            self._resolve(slot)
+        self.op_ids[slot] = self._intern_op(op_name)
+        self.group_ids[slot] = self._intern_group(group)
+        self.msg_sizes[slot] = msg_size
+        self.duration_ns[slot] = -1
+        if self.use_events:
+            from deepspeed.accelerator import get_accelerator
+            if self.events[slot] is None:
+                self.events[slot] = (get_accelerator().Event(enable_timing=True),
+                                     get_accelerator().Event(enable_timing=True))
+            self.events[slot][0].record()
+        self.start_ns[slot] = time.perf_counter_ns()
+        return slot
+
+    def stop(self, slot):
+        self.end_ns[slot] = time.perf_counter_ns()
+        if self.use_events:
+            self.events[slot][1].record()
+            self.pending[slot] = True
+        else:
+            self.duration_ns[slot] = self.end_ns[slot] - self.start_ns[slot]
+
+    def _resolve(self, slot):
+        start_event, end_event = self.events[slot]
+        end_event.synchronize()
+        self.duration_ns[slot] = int(start_event.elapsed_time(end_event) * 1e6)
+        self.pending[slot] = False
+
+    def _ordered_slots(self):
+        """Slots of the records in the buffer, oldest first, with all events resolved."""
+        if self.num_records <= self.buffer_size:
+            slots = np.arange(self.num_records)
+        else:
+            slots = np.roll(np.arange(self.buffer_size), -(self.num_records % self.buffer_size))
+        for slot in np.nonzero(self.pending)[0]:
+            self._resolve(slot)
+        # drop records whose op is still running, e.g. after an exception in the op
+        return slots[self.duration_ns[slots] >= 0]
+
+    def get_chrome_trace(self, rank=0):
+        """Return the records as a Chrome trace (also readable by Perfetto).
+
+        Each process group is shown as a separate thread of the ``rank`` process.
+        """
+        events = [{"name": "process_name", "ph": "M", "pid": rank, "args": {"name": f"rank {rank}"}}]
+        for group_id, group_name in enumerate(self.group_names):
+            events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": rank,
+                "tid": group_id,
+                "args": {
+                    "name": group_name
+                }
+            })
+        for slot in self._ordered_slots():
+            events.append({
+                "name": self.op_names[self.op_ids[slot]],
+                "cat": "comm",
+                "ph": "X",
+                "pid": rank,
+                "tid": int(self.group_ids[slot]),
+                "ts": self.start_ns[slot] / 1e3,
+                "dur": self.duration_ns[slot] / 1e3,
+                "args": {
+                    "msg_size": int(self.msg_sizes[slot]),
+                    "group": self.group_names[self.group_ids[slot]]
+                }
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path, rank=0):
+        with open(path, "w") as f:
+            json.dump(self.get_chrome_trace(rank), f)
+
+    def get_percentiles(self):
+        """Latency statistics in ms for each op name and message size.
+
+        The histogram maps the upper bound in microseconds of each non-empty
+        power of two latency bucket to its number of records.
+        """
+        slots = self._ordered_slots()
+        stats = {}
+        if len(slots) == 0:
+            return stats
+        op_ids = self.op_ids[slots]
+        msg_sizes = self.msg_sizes[slots]
+        durations = self.duration_ns[slots]
+        keys, inverse = np.unique(np.stack([op_ids.astype(np.int64), msg_sizes]), axis=1, return_inverse=True)
+        for key_idx in range(keys.shape[1]):
+            latencies = durations[inverse.reshape(-1) == key_idx] / 1e6
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            buckets = np.ceil(np.log2(np.maximum(latencies * 1e3, 1))).astype(np.int64)
+            bounds, counts = np.unique(buckets, return_counts=True)
+            stats.setdefault(self.op_names[keys[0, key_idx]], {})[int(keys[1, key_idx])] = {
+                "count": len(latencies),
+                "mean": float(latencies.mean()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(latencies.max()),
+                "histogram": {2**int(b): int(c)
+                              for b, c in zip(bounds, counts)}
+            }
+        return stats
+
+
+class StragglerDetector:
+    """Continuous detection of ranks and hosts that are persistently late to collectives.
+
+    Every rank records the host arrival time of each world-sized collective,
+    relative to the end of the previous detection round. Every ``interval`` steps
+    the arrival times are exchanged with a single all_gather, which is also the
+    common time reference of the next round. The lateness of a rank is its mean
+    arrival delay behind the median rank, and a rank (or host, averaged over its
+    ranks) is reported as slow once its lateness exceeds ``threshold_ms`` for
+    ``patience`` consecutive rounds.
+    """
+
+    def __init__(self, interval=100, threshold_ms=5.0, patience=3, max_samples=256, ranks_per_host=None):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.patience = patience
+        self.max_samples = max_samples
+        self.ranks_per_host = ranks_per_host
+
+        self.arrival_ns = np.zeros(max_samples, dtype=np.int64)
+        self.num_arrivals = 0
+        self.sync_ns = time.perf_counter_ns()
+        # arrivals before the first round have no common time reference
+        self.synced = False
+        self.reducing = False
+        self.steps = 0
+        # cached world-sized check of each group seen
+        self.world_groups = {None: True}
+
+        self.slow_rounds = None
+        self.slow_host_rounds = None
+
+    def _is_world_group(self, group):
+        is_world = self.world_groups.get(group)
+        if is_world is None:
+            import deepspeed.comm as dist
+            is_world = self.world_groups[group] = dist.get_world_size(group) == dist.get_world_size()
+        return is_world
+
+    def record_arrival(self, group=None):
+        if self.reducing or self.num_arrivals >= self.max_samples or not self._is_world_group(group):
+            return
+        self.arrival_ns[self.num_arrivals] = time.perf_counter_ns() - self.sync_ns
+        self.num_arrivals += 1
+
+    def _get_ranks_per_host(self, world_size):
+        if self.ranks_per_host is None:
+            for var in ['LOCAL_SIZE', 'LOCAL_WORLD_SIZE', 'OMPI_COMM_WORLD_LOCAL_SIZE']:
+                if var in os.environ:
+                    return int(os.environ[var])
+            return world_size
+        return self.ranks_per_host
+
+    def step(self, global_step, monitor=None):
+        """Called once per training step on all ranks, runs a detection round every ``interval`` steps."""
+        self.steps += 1
+        if self.steps % self.interval != 0:
+            return None
+        report = self.reduce()
+        if report is not None and monitor is not None:
+            monitor.write_events(self.get_events(report, global_step))
+        return report
+
+    def reduce(self):
+        import torch
+        import deepspeed.comm as dist
+        from deepspeed.accelerator import get_accelerator
+
+        local = torch.zeros(self.max_samples + 1, dtype=torch.float64)
+        local[0] = self.num_arrivals
+        local[1:self.num_arrivals + 1] = torch.from_numpy(self.arrival_ns[:self.num_arrivals] / 1e6)
+        local = local.to(get_accelerator().current_device_name())
+        gathered = [torch.zeros_like(local) for _ in range(dist.get_world_size())]
+        self.reducing = True
+        try:
+            dist.all_gather(gathered, local)
+            get_accelerator().synchronize()
+        finally:
+            self.reducing = False
+        self.sync_ns = time.perf_counter_ns()
+        self.num_arrivals = 0
+
+        if not self.synced:
+            self.synced = True
+            return None
+        gathered = torch.stack(gathered).cpu().numpy()
+        return self.update(gathered[:, 1:], gathered[:, 0].astype(np.int64))
+
+    def update(self, arrivals_ms, counts):
+        """Update the slow rank and host state from one round of gathered arrival times.
+
+        ``arrivals_ms`` has one row per rank, of which the first ``counts[rank]`` entries are valid.
+        """
+        world_size = arrivals_ms.shape[0]
+        ranks_per_host = self._get_ranks_per_host(world_size)
+        num_hosts = (world_size + ranks_per_host - 1) // ranks_per_host
+        if self.slow_rounds is None:
+            self.slow_rounds = np.zeros(world_size, dtype=np.int64)
+            self.slow_host_rounds = np.zeros(num_hosts, dtype=np.int64)
+
+        num_samples = int(counts.min())
+        if num_samples == 0:
+            return None
+        arrivals_ms = arrivals_ms[:, :num_samples]
+        lateness = (arrivals_ms - np.median(arrivals_ms, axis=0)).mean(axis=1)
+        host_lateness = np.array(
+            [lateness[h * ranks_per_host:(h + 1) * ranks_per_host].mean() for h in range(num_hosts)])
+
+        self.slow_rounds = np.where(lateness > self.threshold_ms, self.slow_rounds + 1, 0)
+        self.slow_host_rounds = np.where(host_lateness > self.threshold_ms, self.slow_host_rounds + 1, 0)
+        slow_ranks = np.nonzero(self.slow_rounds >= self.patience)[0].tolist()
+        slow_hosts = np.nonzero(self.slow_host_rounds >= self.patience)[0].tolist()
+        if slow_ranks or slow_hosts:
+            log_dist(f"persistent comm stragglers, ranks: {slow_ranks}, hosts: {slow_hosts}", [0])
+
+        return {
+            "num_samples": num_samples,
+            "skew_ms": float((arrivals_ms.max(axis=0) - arrivals_ms.min(axis=0)).mean()),
+            "lateness_ms": lateness,
+            "host_lateness_ms": host_lateness,
+            "slow_ranks": slow_ranks,
+            "slow_hosts": slow_hosts
+        }
+
+    def get_events(self, report, global_step):
+        """Monitor events of a detection round."""
+        lateness = report["lateness_ms"]
+        events = [
+            ("Comms/Straggler/skew_ms", report["skew_ms"], global_step),
+            ("Comms/Straggler/max_lateness_ms", float(lateness.max()), global_step),
+            ("Comms/Straggler/slowest_rank", int(lateness.argmax()), global_step),
+            ("Comms/Straggler/num_slow_ranks", len(report["slow_ranks"]), global_step),
+            ("Comms/Straggler/num_slow_hosts", len(report["slow_hosts"]), global_step),
+        ]
+        for rank in report["slow_ranks"]:
+            events.append((f"Comms/Straggler/rank_{rank}_lateness_ms", float(lateness[rank]), global_step))
+        for host in report["slow_hosts"]:
+            events.append(
+                (f"Comms/Straggler/host_{host}_lateness_ms", float(report["host_lateness_ms"][host]), global_step))
+        return events
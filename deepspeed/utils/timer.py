@@ -216,6 +216,9 @@ class ThroughputTimer:
         self.global_step_count = 0
         self.total_elapsed_time = 0
         self.step_elapsed_time = 0
+        self.total_data_wait_time = 0
+        self.step_data_wait_time = 0
+        self.data_wait_reported = False
         self.steps_per_output = steps_per_output
         self.monitor_memory = monitor_memory
         self.logging = logging_fn
@@ -233,6 +236,13 @@ class ThroughputTimer:
     def _init_timer(self):
         self.initialized = True
 
+    def add_data_wait_time(self, duration):
+        """Account time the training loop spent waiting for a batch, e.g. reported by a prefetching loader."""
+        self.data_wait_reported = True
+        if self.global_step_count >= self.start_step:
+            self.total_data_wait_time += duration
+            self.step_data_wait_time += duration
+
     def start(self):
         self._init_timer()
         self.started = True
@@ -268,6 +278,15 @@ class ThroughputTimer:
                             round(get_accelerator().memory_allocated() / 1024**3, 2),
                             round(get_accelerator().max_memory_allocated() / 1024**3, 2),
                         ))
+                    if self.data_wait_reported:
+                        self.logging(
+                            "epoch={}/micro_step={}/global_step={}, DataWaitTime={}s, AvgDataWaitTime={}s".format(
+                                self.epoch_count,
+                                self.micro_step_count,
+                                self.global_step_count,
+                                round(self.step_data_wait_time, 4),
+                                round(self.avg_data_wait_time(), 4),
+                            ))
                     if self.monitor_memory:
                         virt_mem = psutil.virtual_memory()
                         swap = psutil.swap_memory()
@@ -279,6 +298,13 @@ class ThroughputTimer:
                             swap.percent,
                         ))
                 self.step_elapsed_time = 0
+                self.step_data_wait_time = 0
+
+    def avg_data_wait_time(self):
+        """Average time per global step spent waiting for data."""
+        if self.global_step_count > self.start_step:
+            return self.total_data_wait_time / (self.global_step_count - self.start_step)
+        return 0.0
 
     def avg_samples_per_sec(self):
         if self.global_step_count > 0:
@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+#!/usr/bin/env python
+# Compression ratio and random read throughput of CompressedMMapIndexedDataset against MMapIndexedDataset.
+#
+# usage:
+# ./compressed_indexed_dataset_bench.py --num-samples 20000 --vocab-size 50257
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import (MMapIndexedDataset,
+                                                                           CompressedMMapIndexedDataset,
+                                                                           CompressedMMapIndexedDatasetBuilder,
+                                                                           make_builder)
+
+
+def make_items(num_samples, vocab_size, max_seqlen, seed=0):
+    """Token ids with a Zipf distribution, closer to natural text than uniform ids."""
+    rng = np.random.RandomState(seed)
+    sizes = rng.randint(1, max_seqlen, size=num_samples)
+    tokens = np.minimum(rng.zipf(1.2, size=int(sizes.sum())), vocab_size) - 1
+    return tokens, sizes
+
+
+def write(builder, path, tokens, sizes):
+    builder.add_items_numpy(tokens, sizes)
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    return os.path.getsize(f"{path}.bin")
+
+
+def read_throughput(dataset, indices, sizes):
+    start = time.time()
+    for idx in indices:
+        dataset[int(idx)]
+    return sizes[indices].sum() / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-samples", type=int, default=20000)
+    parser.add_argument("--vocab-size", type=int, default=50257)
+    parser.add_argument("--max-seqlen", type=int, default=2048)
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--num-reads", type=int, default=5000)
+    args = parser.parse_args()
+
+    tokens, sizes = make_items(args.num_samples, args.vocab_size, args.max_seqlen)
+    indices = np.random.RandomState(1).randint(0, args.num_samples, size=args.num_reads)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        raw_path = os.path.join(tmpdir, "raw")
+        raw_builder = make_builder(f"{raw_path}.bin", 'mmap', vocab_size=args.vocab_size)
+        raw_bytes = write(raw_builder, raw_path, tokens, sizes)
+        raw = MMapIndexedDataset(raw_path, skip_warmup=True)
+        raw_tput = read_throughput(raw, indices, sizes)
+        print(f"raw {np.dtype(raw.dtype).name}: {raw_bytes / 1e6:.1f} MB, {raw_tput / 1e6:.1f} Mtokens/s")
+
+        for codec in ['bitpack', 'zlib']:
+            path = os.path.join(tmpdir, codec)
+            builder = CompressedMMapIndexedDatasetBuilder(f"{path}.bin",
+                                                          dtype=raw.dtype,
+                                                          codec=codec,
+                                                          block_size=args.block_size)
+            start = time.time()
+            compressed_bytes = write(builder, path, tokens, sizes)
+            write_time = time.time() - start
+            dataset = CompressedMMapIndexedDataset(path)
+            tput = read_throughput(dataset, indices, sizes)
+            # a full pass in order decodes every block once
+            sequential_tput = read_throughput(dataset, np.arange(args.num_samples), sizes)
+            print(f"{codec}: {compressed_bytes / 1e6:.1f} MB (ratio {raw_bytes / compressed_bytes:.2f}), "
+                  f"write {len(tokens) / write_time / 1e6:.1f} Mtokens/s, random read {tput / 1e6:.1f} Mtokens/s, "
+                  f"sequential read {sequential_tput / 1e6:.1f} Mtokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+#!/usr/bin/env python
+# Compares the DataLoader based DataAnalyzer map phase with the vectorized map over an MMapIndexedDataset.
+#
+# usage:
+# ./data_analyzer_map_bench.py --num-samples 100000
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from deepspeed.runtime.data_pipeline.data_sampling.data_analyzer import DataAnalyzer
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import MMapIndexedDataset, MMapIndexedDatasetBuilder
+from deepspeed.runtime.data_pipeline.data_sampling.metrics import SeqLenMetric, VocabRarityMetric
+
+
+class TokenDataset(torch.utils.data.Dataset):
+    """Per-item view of an MMapIndexedDataset, as consumed by the DataLoader based map."""
+
+    def __init__(self, mmap_dataset):
+        self.mmap_dataset = mmap_dataset
+
+    def __len__(self):
+        return len(self.mmap_dataset)
+
+    def __getitem__(self, idx):
+        return {"tokens": torch.from_numpy(self.mmap_dataset[idx].astype(np.int64)), "index": torch.tensor([idx])}
+
+
+def collate(batch):
+    return {"tokens": [item["tokens"] for item in batch], "index": torch.stack([item["index"] for item in batch])}
+
+
+def build_dataset(path, num_samples, vocab_size, max_seqlen):
+    rng = np.random.RandomState(0)
+    builder = MMapIndexedDatasetBuilder(f"{path}.bin", dtype=np.uint16)
+    for _ in range(num_samples):
+        builder.add_item_numpy(rng.randint(0, vocab_size, size=rng.randint(1, max_seqlen)))
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    return MMapIndexedDataset(path, skip_warmup=True)
+
+
+def run_map(dataset, metric_functions, save_path, batch_size, collate_fn=None):
+    analyzer = DataAnalyzer(dataset,
+                            batch_size=batch_size,
+                            metric_names=["seqlen", "vocab_rarity"],
+                            metric_functions=metric_functions,
+                            metric_types=["single_value_per_sample"] * 2,
+                            metric_dtypes=[np.int64] * 2,
+                            save_path=save_path,
+                            collate_fn=collate_fn)
+    start = time.time()
+    analyzer.run_map()
+    return time.time() - start
+
+
+def time_metric_computation(dataset, loader_fns, vectorized_fns, batch_size):
+    """Metric evaluation only, without the map output files whose cost is the same for both paths."""
+    loader = torch.utils.data.DataLoader(TokenDataset(dataset), batch_size=batch_size, collate_fn=collate)
+    start = time.time()
+    for data in loader:
+        for fn in loader_fns:
+            fn(data)
+    loader_time = time.time() - start
+
+    start = time.time()
+    for chunk_start in range(0, len(dataset), 65536):
+        sizes = dataset.sizes[chunk_start:chunk_start + 65536].astype(np.int64)
+        tokens = dataset.get(chunk_start, length=int(sizes.sum()))
+        for fn in vectorized_fns:
+            fn(tokens, sizes)
+    return loader_time, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-samples", type=int, default=100000)
+    parser.add_argument("--vocab-size", type=int, default=50257)
+    parser.add_argument("--max-seqlen", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset = build_dataset(os.path.join(tmpdir, "tokens"), args.num_samples, args.vocab_size, args.max_seqlen)
+        vocab_freq = np.bincount(dataset.get(0, length=int(dataset.sizes.sum())), minlength=args.vocab_size)
+        rarity = VocabRarityMetric(vocab_freq)
+
+        def seqlen_fn(data):
+            return torch.tensor([len(t) for t in data["tokens"]])
+
+        def rarity_fn(data):
+            return torch.tensor(
+                [int(np.rint(rarity.neg_log_prob[t.numpy()].sum() * rarity.scale)) for t in data["tokens"]])
+
+        loader_metric_time, vectorized_metric_time = time_metric_computation(dataset, [seqlen_fn, rarity_fn],
+                                                                             [SeqLenMetric(), rarity], args.batch_size)
+        loader_time = run_map(TokenDataset(dataset), [seqlen_fn, rarity_fn], os.path.join(tmpdir, "loader"),
+                              args.batch_size, collate)
+        vectorized_time = run_map(dataset, [SeqLenMetric(), rarity], os.path.join(tmpdir, "vectorized"),
+                                  args.batch_size)
+
+    print(f"samples: {args.num_samples}, dataloader map: {loader_time:.2f}s "
+          f"({args.num_samples / loader_time:.0f} samples/s), vectorized map: {vectorized_time:.2f}s "
+          f"({args.num_samples / vectorized_time:.0f} samples/s), speedup: {loader_time / vectorized_time:.1f}x")
+    print(
+        f"metric computation only, dataloader: {loader_metric_time:.2f}s, vectorized: {vectorized_metric_time:.2f}s, "
+        f"speedup: {loader_metric_time / vectorized_metric_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
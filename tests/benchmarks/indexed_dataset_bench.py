@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+#!/usr/bin/env python
+# Compares per-item MMapIndexedDataset reads with get_batch and get_packed_blocks for random index batches.
+#
+# usage:
+# ./indexed_dataset_bench.py --num-samples 200000 --batch-size 512
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import MMapIndexedDataset, MMapIndexedDatasetBuilder
+
+
+def build_dataset(path, num_samples, vocab_size, max_seqlen):
+    rng = np.random.RandomState(0)
+    sizes = rng.randint(1, max_seqlen, size=num_samples)
+    builder = MMapIndexedDatasetBuilder(f"{path}.bin", dtype=np.uint16)
+    builder.add_items_numpy(rng.randint(0, vocab_size, size=int(sizes.sum())).astype(np.uint16), sizes)
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    return MMapIndexedDataset(path, skip_warmup=True)
+
+
+def per_item(dataset, indices):
+    return np.concatenate([dataset[int(i)] for i in indices])
+
+
+def per_item_packed(dataset, indices, block_length):
+    flat = per_item(dataset, indices)
+    num_blocks = len(flat) // block_length
+    return flat[:num_blocks * block_length].reshape(num_blocks, block_length)
+
+
+def bench(fn, batches):
+    num_tokens = 0
+    start = time.time()
+    for indices in batches:
+        out = fn(indices)
+        num_tokens += out[0].size if isinstance(out, tuple) else out.size
+    return num_tokens / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-samples", type=int, default=200000)
+    parser.add_argument("--vocab-size", type=int, default=50257)
+    parser.add_argument("--max-seqlens", type=int, nargs="+", default=[64, 512, 8192])
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--num-batches", type=int, default=50)
+    parser.add_argument("--block-length", type=int, default=2048)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(1)
+    for max_seqlen in args.max_seqlens:
+        num_samples = min(args.num_samples, 200000000 // max_seqlen)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dataset = build_dataset(os.path.join(tmpdir, "tokens"), num_samples, args.vocab_size, max_seqlen)
+            batches = [rng.randint(0, num_samples, size=args.batch_size) for _ in range(args.num_batches)]
+            # warm the page cache so both paths read from memory
+            dataset.get(0, length=int(dataset.sizes.astype(np.int64).sum())).sum()
+
+            item_tput = bench(lambda idx: per_item(dataset, idx), batches)
+            batch_tput = bench(dataset.get_batch, batches)
+            item_pack_tput = bench(lambda idx: per_item_packed(dataset, idx, args.block_length), batches)
+            pack_tput = bench(lambda idx: dataset.get_packed_blocks(idx, args.block_length, drop_last=True), batches)
+
+        print(f"max_seqlen {max_seqlen}: per item {item_tput / 1e6:.1f} Mtokens/s, get_batch "
+              f"{batch_tput / 1e6:.1f} Mtokens/s ({batch_tput / item_tput:.1f}x), per item packing "
+              f"{item_pack_tput / 1e6:.1f} Mtokens/s, get_packed_blocks {pack_tput / 1e6:.1f} Mtokens/s "
+              f"({pack_tput / item_pack_tput:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+#!/usr/bin/env python
+# Compares merging MMapIndexedDataset shards with MMapIndexedDatasetBuilder.merge_file_ and with
+# merge_mmap_dataset_shards.
+#
+# usage:
+# ./indexed_dataset_merge_bench.py --num-shards 1000 --shard-mb 4 --dir /path/on/nvme
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import (MMapIndexedDatasetBuilder,
+                                                                           MMapIndexedDatasetShardedBuilder)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-shards", type=int, default=1000)
+    parser.add_argument("--shard-mb", type=float, default=4)
+    parser.add_argument("--num-threads", type=int, default=8)
+    parser.add_argument("--dir", type=str, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmpdir:
+        sharded_builder = MMapIndexedDatasetShardedBuilder(f"{tmpdir}/merged", args.num_shards, dtype=np.int64)
+        rng = np.random.RandomState(0)
+        shard_elements = int(args.shard_mb * 1024 * 1024 / 8)
+        for shard_id in range(args.num_shards):
+            builder = sharded_builder.shard_builder(shard_id)
+            sizes = np.full(shard_elements // 1000, 1000)
+            builder.add_items_numpy(rng.randint(0, 2**31, size=int(sizes.sum())), sizes)
+            builder.end_document()
+            sharded_builder.finalize_shard(builder, shard_id)
+        # time durable merges, so that one does not pay for the writeback of the other
+        os.sync()
+
+        start = time.time()
+        builder = MMapIndexedDatasetBuilder(f"{tmpdir}/sequential.bin", dtype=np.int64)
+        for shard_id in range(args.num_shards):
+            builder.merge_file_(sharded_builder.shard_prefix(shard_id))
+        builder.finalize(f"{tmpdir}/sequential.idx")
+        os.sync()
+        sequential_time = time.time() - start
+
+        start = time.time()
+        sharded_builder.merge(num_threads=args.num_threads)
+        os.sync()
+        concurrent_time = time.time() - start
+
+    total_mb = args.num_shards * args.shard_mb
+    print(f"{args.num_shards} shards, {total_mb:.0f} MB: merge_file_ {sequential_time:.2f}s "
+          f"({total_mb / sequential_time:.0f} MB/s), merge_mmap_dataset_shards {concurrent_time:.2f}s "
+          f"({total_mb / concurrent_time:.0f} MB/s), speedup {sequential_time / concurrent_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import json
+import os
+import pytest
+import torch
+
+import deepspeed.comm as dist
+from deepspeed.comm.collective_selector import CollectiveAlgorithmSelector, SELECTED_OPS
+
+from unit.common import DistributedTest
+
+
+def get_inputs(numel, rank, world_size, dtype=torch.float32):
+    # distinct values per rank and element, exactly representable when summed
+    return [torch.arange(numel, dtype=dtype) * world_size + r for r in range(world_size)]
+
+
+def check_algorithm(selector, algo, numel, rank, world_size):
+    inputs = get_inputs(numel * world_size, rank, world_size)
+    expected_sum = torch.stack(inputs).sum(dim=0)
+
+    for op, expected in [(torch.distributed.ReduceOp.SUM, expected_sum),
+                         (torch.distributed.ReduceOp.MAX, torch.stack(inputs).max(dim=0).values),
+                         (torch.distributed.ReduceOp.AVG, expected_sum / world_size)]:
+        tensor = inputs[rank].clone()
+        selector.all_reduce(tensor, op, algo)
+        assert torch.allclose(tensor, expected), (algo, op)
+
+    output = torch.empty(numel * world_size * world_size)
+    selector.all_gather_into_tensor(output, inputs[rank], algo)
+    assert torch.equal(output, torch.cat(inputs))
+
+    output = torch.empty(numel)
+    input_tensor = inputs[rank].clone()
+    selector.reduce_scatter_tensor(output, input_tensor, torch.distributed.ReduceOp.SUM, algo)
+    assert torch.equal(output, expected_sum.view(world_size, -1)[rank])
+    assert torch.equal(input_tensor, inputs[rank])
+
+
+# two simulated nodes of two ranks
+@pytest.mark.parametrize("ranks_per_node", [2, 4])
+class TestCollectiveAlgorithmSelector(DistributedTest):
+    world_size = 4
+    backend = 'gloo'
+    requires_cuda_env = False
+
+    def test(self, ranks_per_node, tmpdir):
+        profile_path = os.path.join(str(tmpdir), f"profile_{ranks_per_node}.json")
+        selector = CollectiveAlgorithmSelector(ranks_per_node=ranks_per_node,
+                                               min_bytes=1024,
+                                               max_bytes=65536,
+                                               iters=1,
+                                               chunk_bytes=4096,
+                                               profile_path=profile_path)
+        rank = dist.get_rank()
+        if ranks_per_node == 2:
+            assert 'hierarchical' in selector.algorithms
+        else:
+            assert 'hierarchical' not in selector.algorithms
+        for algo in selector.algorithms:
+            if algo != 'direct':
+                # uneven ring chunks for all_reduce
+                for numel in [1, 5, 1000]:
+                    check_algorithm(selector, algo, numel, rank, 4)
+
+        # gloo does not implement the direct all_gather_into_tensor and reduce_scatter_tensor
+        assert 'direct' not in selector.table['all_gather_into_tensor']
+        assert 'direct' not in selector.table['reduce_scatter_tensor']
+        assert all(len(selector.table[op]) == len(selector.bucket_bytes) for op in SELECTED_OPS)
+
+        dist.barrier()
+        with open(profile_path) as f:
+            assert json.load(f)["table"] == selector.table
+        # the cached profile is used as is
+        cached = CollectiveAlgorithmSelector(ranks_per_node=ranks_per_node,
+                                             min_bytes=1024,
+                                             max_bytes=65536,
+                                             iters=1,
+                                             chunk_bytes=4096,
+                                             profile_path=profile_path)
+        assert cached.table == selector.table
+
+
+class TestTorchBackendAlgorithmSelection(DistributedTest):
+    world_size = 4
+    backend = 'gloo'
+    requires_cuda_env = False
+
+    def test(self):
+        dist.cdb.enable_algorithm_selection(ranks_per_node=2, min_bytes=1024, max_bytes=16384, iters=1)
+        try:
+            rank = dist.get_rank()
+            inputs = get_inputs(4096, rank, 4)
+            output = torch.empty(4096 * 4)
+            dist.all_gather_into_tensor(output, inputs[rank])
+            assert torch.equal(output, torch.cat(inputs))
+
+            output = torch.empty(1024)
+            dist.reduce_scatter_tensor(output, inputs[rank])
+            assert torch.equal(output, torch.stack(inputs).sum(dim=0).view(4, -1)[rank])
+
+            tensor = inputs[rank].clone()
+            dist.all_reduce(tensor)
+            assert torch.equal(tensor, torch.stack(inputs).sum(dim=0))
+        finally:
+            dist.cdb.algorithm_selector = None
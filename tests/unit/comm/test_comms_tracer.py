@@ -0,0 +1,76 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import json
+import torch
+
+import deepspeed.comm as dist
+from deepspeed.comm.comm import timed_op, comms_logger
+from deepspeed.utils.comms_logging import CommsTracer
+
+
+def test_ring_buffer_wraps(tmpdir):
+    tracer = CommsTracer(buffer_size=4, use_events=False)
+    for i in range(6):
+        tracer.stop(tracer.start(f"op_{i}", msg_size=i, group=None if i % 2 else "dp"))
+    assert len(tracer) == 4
+
+    path = f"{tmpdir}/trace.json"
+    tracer.export_chrome_trace(path, rank=3)
+    with open(path) as f:
+        trace = json.load(f)
+    ops = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    # only the newest records are kept, oldest first
+    assert [event["name"] for event in ops] == ["op_2", "op_3", "op_4", "op_5"]
+    assert [event["args"]["msg_size"] for event in ops] == [2, 3, 4, 5]
+    assert all(event["pid"] == 3 and event["dur"] >= 0 for event in ops)
+    assert [event["ts"] for event in ops] == sorted(event["ts"] for event in ops)
+    thread_names = {
+        event["tid"]: event["args"]["name"]
+        for event in trace["traceEvents"] if event["name"] == "thread_name"
+    }
+    assert {thread_names[event["tid"]] for event in ops} == {"group_0", "world"}
+
+
+def test_percentiles():
+    tracer = CommsTracer(buffer_size=1024, use_events=False)
+    for i in range(100):
+        for op_name, msg_size in [("all_reduce", 1024), ("all_reduce", 4096), ("all_gather", 1024)]:
+            slot = tracer.start(op_name, msg_size)
+            tracer.stop(slot)
+            # 1..100 ms
+            tracer.end_ns[slot] = tracer.start_ns[slot] + (i + 1) * 1000000
+            tracer.duration_ns[slot] = (i + 1) * 1000000
+
+    stats = tracer.get_percentiles()
+    assert set(stats.keys()) == {"all_reduce", "all_gather"}
+    assert set(stats["all_reduce"].keys()) == {1024, 4096}
+    vals = stats["all_gather"][1024]
+    assert vals["count"] == 100
+    assert abs(vals["mean"] - 50.5) < 1e-6 and abs(vals["p50"] - 50.5) < 1e-6
+    assert 90 <= vals["p90"] <= 91 and 99 <= vals["p99"] <= 100 and vals["max"] == 100
+    assert sum(vals["histogram"].values()) == 100
+    # 1 ms falls into the (512, 1024] us bucket, 100 ms into (65536, 131072]
+    assert min(vals["histogram"]) == 1024 and max(vals["histogram"]) == 131072
+
+
+def test_timed_op_trace():
+
+    @timed_op
+    def fake_all_reduce(tensor, op=None, group=None, async_op=False, prof=False, log_name='all_reduce'):
+        return tensor
+
+    dist.configure(enabled=True, prof_all=True, trace=True)
+    try:
+        tensor = torch.zeros(16, dtype=torch.float32)
+        for _ in range(3):
+            fake_all_reduce(tensor)
+        fake_all_reduce(tensor, None, "tp")
+        stats = comms_logger.tracer.get_percentiles()
+        assert stats["all_reduce"][64]["count"] == 4
+        assert comms_logger.comms_dict == {}
+        assert comms_logger.tracer.group_names == ["world", "group_1"]
+    finally:
+        dist.configure(enabled=False, trace=False)
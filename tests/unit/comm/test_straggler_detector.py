@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import numpy as np
+
+from deepspeed.utils.comms_logging import StragglerDetector
+
+
+class EventCollector:
+
+    def __init__(self):
+        self.events = []
+
+    def write_events(self, event_list):
+        self.events.extend(event_list)
+
+
+def get_arrivals(world_size, num_samples, late_ranks, delay_ms, seed):
+    rng = np.random.RandomState(seed)
+    arrivals = np.cumsum(rng.uniform(1, 10, size=num_samples))[None, :] + rng.uniform(
+        0, 0.5, (world_size, num_samples))
+    arrivals[late_ranks] += delay_ms
+    return arrivals
+
+
+def test_slow_rank_and_host():
+    detector = StragglerDetector(threshold_ms=2.0, patience=3, ranks_per_host=4)
+    counts = np.full(16, 50)
+    for round_idx in range(3):
+        # rank 5 is always late, host 3 (ranks 12-15) is late from the second round on
+        late_ranks = [5] + ([12, 13, 14, 15] if round_idx > 0 else [])
+        report = detector.update(get_arrivals(16, 50, late_ranks, 10.0, round_idx), counts)
+
+    assert report["slow_ranks"] == [5]
+    assert report["slow_hosts"] == [1]
+    assert abs(report["lateness_ms"][5] - 10.0) < 1.0
+    assert report["skew_ms"] > 9.0
+
+    # host 3 reaches the patience one round later, rank 5 recovers
+    report = detector.update(get_arrivals(16, 50, [12, 13, 14, 15], 10.0, 3), counts)
+    assert report["slow_ranks"] == [12, 13, 14, 15]
+    assert report["slow_hosts"] == [3]
+
+    events = dict((name, value) for name, value, _ in detector.get_events(report, 100))
+    assert events["Comms/Straggler/num_slow_ranks"] == 4
+    assert events["Comms/Straggler/num_slow_hosts"] == 1
+    assert "Comms/Straggler/host_3_lateness_ms" in events
+    assert events["Comms/Straggler/slowest_rank"] in [12, 13, 14, 15]
+
+
+def test_uneven_counts_and_no_stragglers():
+    detector = StragglerDetector(threshold_ms=2.0, patience=1, ranks_per_host=2)
+    arrivals = get_arrivals(4, 20, [], 0.0, 0)
+    counts = np.array([20, 12, 20, 20])
+    arrivals[1, 12:] = 0
+    report = detector.update(arrivals, counts)
+    assert report["num_samples"] == 12
+    assert report["slow_ranks"] == [] and report["slow_hosts"] == []
+    assert detector.update(arrivals, np.array([20, 0, 20, 20])) is None
+
+
+def test_record_arrival_is_bounded():
+    detector = StragglerDetector(interval=2, max_samples=8)
+    for _ in range(20):
+        detector.record_arrival()
+    assert detector.num_arrivals == 8
+    assert np.all(np.diff(detector.arrival_ns[:8]) >= 0)
+    # detection rounds only run every interval steps
+    monitor = EventCollector()
+    detector.reduce = lambda: None
+    assert detector.step(1, monitor) is None and detector.steps == 1
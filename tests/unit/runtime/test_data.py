@@ -3,7 +3,9 @@
 
 # DeepSpeed Team
 
-from deepspeed.utils import RepeatingLoader
+import time
+from deepspeed.utils import RepeatingLoader, PrefetchLoader
+from deepspeed.utils.timer import ThroughputTimer
 import torch
 import pytest
 import deepspeed
@@ -22,6 +24,59 @@ def test_repeating_loader():
         assert next(loader) == 3
 
 
+def test_prefetch_loader():
+    batches = [(torch.full((2, ), i), {"label": torch.tensor(i)}) for i in range(5)]
+    loader = PrefetchLoader(batches, prefetch_batches=2, device='cpu')
+
+    for _ in range(2):
+        for idx, (x, y) in enumerate(loader):
+            assert torch.equal(x, torch.full((2, ), idx))
+            assert y["label"].item() == idx
+        assert idx == 4
+    with pytest.raises(StopIteration):
+        next(loader)
+
+
+def test_prefetch_loader_repeating():
+    loader = RepeatingLoader(PrefetchLoader([1, 2, 3], prefetch_batches=2))
+
+    for idx in range(10):
+        assert next(loader) == 1
+        assert next(loader) == 2
+        assert next(loader) == 3
+
+
+def test_prefetch_loader_error():
+
+    def batches():
+        yield 1
+        raise ValueError("bad batch")
+
+    loader = iter(PrefetchLoader(batches(), prefetch_batches=2))
+    assert next(loader) == 1
+    with pytest.raises(ValueError):
+        next(loader)
+    with pytest.raises(StopIteration):
+        next(loader)
+
+
+def test_prefetch_loader_data_wait():
+
+    class SlowLoader:
+
+        def __iter__(self):
+            for i in range(3):
+                time.sleep(0.05)
+                yield i
+
+    timer = ThroughputTimer(batch_size=1, start_step=0)
+    loader = PrefetchLoader(SlowLoader(), prefetch_batches=1, tput_timer=timer)
+    assert list(loader) == [0, 1, 2]
+    assert timer.data_wait_reported
+    assert timer.total_data_wait_time >= 0.1
+    assert loader.data_wait_time == pytest.approx(timer.total_data_wait_time)
+
+
 @pytest.mark.parametrize('train_batch_size, drop_last', [(1, True), (4, True), (1, False), (4, False)])
 class TestDataLoaderDropLast(DistributedTest):
     world_size = 1
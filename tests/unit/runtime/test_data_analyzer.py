@@ -0,0 +1,149 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import numpy as np
+import pytest
+import torch
+
+from deepspeed.runtime.data_pipeline.data_sampling.data_analyzer import DataAnalyzer
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import MMapIndexedDataset, MMapIndexedDatasetBuilder
+from deepspeed.runtime.data_pipeline.data_sampling.metrics import SeqLenMetric, TotalVocabFreqMetric, VocabRarityMetric
+
+
+class SeqLenDataset(torch.utils.data.Dataset):
+
+    def __init__(self, num_samples, max_seqlen=17, seed=0):
+        self.seqlens = np.random.RandomState(seed).randint(1, max_seqlen, size=num_samples)
+
+    def __len__(self):
+        return len(self.seqlens)
+
+    def __getitem__(self, idx):
+        return {"seqlen": torch.tensor([self.seqlens[idx]]), "index": torch.tensor([idx])}
+
+
+def seqlen_metric(data):
+    return data["seqlen"].reshape(-1)
+
+
+def run_analyzer(dataset, save_path, streaming_reduce, num_workers=2, num_threads=2, num_threads_reduce=3):
+    for worker_id in range(num_workers):
+        analyzer = DataAnalyzer(dataset,
+                                num_workers=num_workers,
+                                worker_id=worker_id,
+                                num_threads=num_threads,
+                                num_threads_reduce=num_threads_reduce,
+                                batch_size=8,
+                                metric_names=["seqlen"],
+                                metric_functions=[seqlen_metric],
+                                metric_types=["single_value_per_sample"],
+                                metric_dtypes=[np.int64],
+                                save_path=save_path,
+                                streaming_reduce=streaming_reduce,
+                                reduce_chunk_size=16)
+        analyzer.run_map()
+    analyzer.run_reduce()
+
+
+def load_outputs(save_path):
+    outputs = {}
+    for suffix in ["sample_to_metric", "index_to_sample", "index_to_metric", "index_to_sample_percentile_merged"]:
+        data = MMapIndexedDataset(f"{save_path}/seqlen/seqlen_{suffix}", skip_warmup=True)
+        outputs[suffix] = (data.dtype, [np.array(data[i]) for i in range(len(data))])
+    return outputs
+
+
+@pytest.mark.parametrize("num_threads_reduce", [1, 3])
+def test_streaming_reduce_matches_default(tmpdir, num_threads_reduce):
+    dataset = SeqLenDataset(num_samples=150)
+    run_analyzer(dataset, f"{tmpdir}/default", streaming_reduce=False, num_threads_reduce=num_threads_reduce)
+    run_analyzer(dataset, f"{tmpdir}/streaming", streaming_reduce=True, num_threads_reduce=num_threads_reduce)
+
+    expected = load_outputs(f"{tmpdir}/default")
+    actual = load_outputs(f"{tmpdir}/streaming")
+    for suffix in expected:
+        assert expected[suffix][0] == actual[suffix][0]
+        assert len(expected[suffix][1]) == len(actual[suffix][1])
+        for expected_item, actual_item in zip(expected[suffix][1], actual[suffix][1]):
+            assert np.array_equal(expected_item, actual_item)
+
+
+def test_streaming_reduce_resumes(tmpdir):
+    dataset = SeqLenDataset(num_samples=100)
+    save_path = f"{tmpdir}/streaming"
+    run_analyzer(dataset, save_path, streaming_reduce=True)
+    first = load_outputs(save_path)
+
+    # a rerun reuses the cached value counts and produces the same outputs
+    analyzer = DataAnalyzer(dataset,
+                            num_workers=2,
+                            num_threads=2,
+                            num_threads_reduce=3,
+                            metric_names=["seqlen"],
+                            metric_functions=[seqlen_metric],
+                            metric_types=["single_value_per_sample"],
+                            metric_dtypes=[np.int64],
+                            save_path=save_path,
+                            streaming_reduce=True)
+    analyzer.run_reduce()
+    second = load_outputs(save_path)
+    for suffix in first:
+        for first_item, second_item in zip(first[suffix][1], second[suffix][1]):
+            assert np.array_equal(first_item, second_item)
+
+
+def create_token_dataset(path, num_samples=200, vocab_size=50, seed=0):
+    rng = np.random.RandomState(seed)
+    builder = MMapIndexedDatasetBuilder(f"{path}.bin", dtype=np.uint16)
+    samples = []
+    for _ in range(num_samples):
+        tokens = rng.randint(0, vocab_size, size=rng.randint(0, 30))
+        builder.add_item_numpy(tokens)
+        samples.append(tokens)
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    return MMapIndexedDataset(path, skip_warmup=True), samples
+
+
+def test_vectorized_map(tmpdir):
+    vocab_size = 50
+    dataset, samples = create_token_dataset(f"{tmpdir}/tokens", vocab_size=vocab_size)
+    vocab_freq = np.bincount(np.concatenate(samples), minlength=vocab_size)
+    metric_names = ["seqlen", "vocab_rarity", "total_vocab_freq"]
+    metric_functions = [SeqLenMetric(), VocabRarityMetric(vocab_freq), TotalVocabFreqMetric(vocab_size)]
+    metric_types = ["single_value_per_sample", "single_value_per_sample", "accumulate_value_over_samples"]
+    save_path = f"{tmpdir}/analysis"
+    for worker_id in range(2):
+        analyzer = DataAnalyzer(dataset,
+                                num_workers=2,
+                                worker_id=worker_id,
+                                num_threads=2,
+                                metric_names=metric_names,
+                                metric_functions=metric_functions,
+                                metric_types=metric_types,
+                                metric_dtypes=[np.int64] * 3,
+                                save_path=save_path,
+                                map_chunk_size=16)
+        assert analyzer.use_vectorized_map()
+        analyzer.run_map()
+    analyzer.run_reduce()
+
+    seqlen = MMapIndexedDataset(f"{save_path}/seqlen/seqlen_sample_to_metric", skip_warmup=True)
+    assert np.array_equal(np.concatenate([seqlen[i] for i in range(len(seqlen))]), [len(s) for s in samples])
+
+    neg_log_prob = -np.log(np.maximum(vocab_freq, 1) / vocab_freq.sum())
+    expected_rarity = [int(np.rint(neg_log_prob[s].sum() * 100)) for s in samples]
+    rarity = MMapIndexedDataset(f"{save_path}/vocab_rarity/vocab_rarity_sample_to_metric", skip_warmup=True)
+    assert np.array_equal(np.concatenate([rarity[i] for i in range(len(rarity))]), expected_rarity)
+
+    index_to_sample = MMapIndexedDataset(f"{save_path}/seqlen/seqlen_index_to_sample", skip_warmup=True)
+    index_to_metric = MMapIndexedDataset(f"{save_path}/seqlen/seqlen_index_to_metric", skip_warmup=True)
+    for v_idx in range(len(index_to_metric)):
+        expected = [i for i, s in enumerate(samples) if len(s) == index_to_metric[v_idx][0]]
+        assert np.array_equal(index_to_sample[v_idx], expected)
+
+    total_vocab_freq = MMapIndexedDataset(f"{save_path}/total_vocab_freq/total_vocab_freq_metric_value",
+                                          skip_warmup=True)
+    assert np.array_equal(total_vocab_freq[0], vocab_freq)
@@ -0,0 +1,123 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import copy
+import numpy as np
+import pytest
+
+from deepspeed.runtime.data_pipeline.data_sampling.data_sampler import DeepSpeedDataSampler
+from deepspeed.runtime.data_pipeline.data_sampling.utils import (FeistelPermutation, create_mmap_dataset_builder,
+                                                                 close_mmap_dataset_builder)
+
+NUM_SAMPLES = 200
+
+
+def build_metric_index(save_path, seed=0):
+    """Write index_to_sample and index_to_metric files for a random per-sample metric."""
+    values = np.random.RandomState(seed).randint(1, 10, size=NUM_SAMPLES)
+    index_to_sample = create_mmap_dataset_builder(f"{save_path}_index_to_sample", np.int64)
+    index_to_metric = create_mmap_dataset_builder(f"{save_path}_index_to_metric", np.int64)
+    for value in np.unique(values):
+        index_to_sample.add_item_numpy(np.nonzero(values == value)[0])
+        index_to_metric.add_item_numpy(np.array([value]))
+    close_mmap_dataset_builder(index_to_sample, f"{save_path}_index_to_sample")
+    close_mmap_dataset_builder(index_to_metric, f"{save_path}_index_to_metric")
+    return values
+
+
+def get_sampler(save_path, difficulty_type, index_range_clusters=True, max_difficulty=9):
+    config = {
+        "seed": 1234,
+        "data_sampling": {
+            "num_epochs": 1,
+            "curriculum_learning": {
+                "enabled": True,
+                "data_cluster_path": f"{save_path}_clusters",
+                "index_range_clusters": index_range_clusters,
+                "curriculum_metrics": {
+                    "metric": {
+                        "index_to_sample_path": f"{save_path}_index_to_sample",
+                        "index_to_metric_path": f"{save_path}_index_to_metric",
+                        "difficulty_type": difficulty_type,
+                        "clustering_type": "schedule_based",
+                        "min_difficulty": 1,
+                        "max_difficulty": max_difficulty,
+                        "schedule_type": "custom"
+                    }
+                }
+            }
+        }
+    }
+    return DeepSpeedDataSampler(config,
+                                one_epoch_total_samples=NUM_SAMPLES,
+                                micro_batch_size=4,
+                                data_parallel_rank=0,
+                                data_parallel_size=1,
+                                data_parallel_group=None,
+                                gradient_accumulation_steps=1,
+                                global_rank=0)
+
+
+def add_cluster(sampler, previous_difficulty, difficulty):
+    sampler.current_difficulties = {"metric": difficulty}
+    sampler.get_new_cluster({"metric": previous_difficulty})
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64, 1000, 4097])
+def test_feistel_permutation_is_bijective(size):
+    permuted = FeistelPermutation(size, seed=7)(np.arange(size))
+    assert np.array_equal(np.sort(permuted), np.arange(size))
+    assert np.array_equal(FeistelPermutation(size, seed=7)(np.arange(size)), permuted)
+    if size > 64:
+        assert not np.array_equal(FeistelPermutation(size, seed=8)(np.arange(size)), permuted)
+
+
+def test_index_range_clusters_match_metric_values(tmpdir):
+    save_path = f"{tmpdir}/metric"
+    values = build_metric_index(save_path)
+    sampler = get_sampler(save_path, "value")
+    add_cluster(sampler, float('-inf'), 3)
+    add_cluster(sampler, 3, 6)
+
+    assert sampler.data_cluster_sizes == [np.sum(values <= 3), np.sum((values > 3) & (values <= 6))]
+    first = sampler.get_sample_from_cluster(0, sampler.data_cluster_sizes[0])
+    second = sampler.get_sample_from_cluster(1, sampler.data_cluster_sizes[1])
+    assert sorted(first) == np.nonzero(values <= 3)[0].tolist()
+    assert sorted(second) == np.nonzero((values > 3) & (values <= 6))[0].tolist()
+    # samples are drawn in a shuffled order
+    assert first != sorted(first)
+
+    # an exhausted cluster continues with a different permutation of the same samples
+    again = sampler.get_sample_from_cluster(0, sampler.data_cluster_sizes[0])
+    assert sorted(again) == sorted(first) and again != first
+    assert not (tmpdir / "metric_clusters").exists()
+
+
+def test_index_range_clusters_match_metric_percentiles(tmpdir):
+    save_path = f"{tmpdir}/metric"
+    build_metric_index(save_path)
+    reference = get_sampler(save_path, "percentile", index_range_clusters=False, max_difficulty=100)
+    sampler = get_sampler(save_path, "percentile", max_difficulty=100)
+    for previous_difficulty, difficulty in [(0, 30), (30, 100)]:
+        expected = reference.get_sample_based_on_metric_percentile("metric", previous_difficulty, difficulty)
+        add_cluster(sampler, previous_difficulty, difficulty)
+        cidx = len(sampler.data_clusters) - 1
+        assert sorted(sampler.get_sample_from_cluster(cidx, len(expected))) == sorted(expected.tolist())
+
+
+def test_index_range_clusters_resume(tmpdir):
+    save_path = f"{tmpdir}/metric"
+    build_metric_index(save_path)
+    sampler = get_sampler(save_path, "value")
+    sampler.curriculum_step = 2
+    add_cluster(sampler, float('-inf'), 5)
+    sampler.get_sample_from_cluster(0, sampler.data_cluster_sizes[0] + 3)
+    state_dict = copy.deepcopy(sampler.state_dict())
+    expected = sampler.get_sample_from_cluster(0, 10)
+
+    resumed = get_sampler(save_path, "value")
+    resumed.load_state_dict(state_dict)
+    assert resumed.data_cluster_sizes == sampler.data_cluster_sizes
+    assert resumed.get_sample_from_cluster(0, 10) == expected
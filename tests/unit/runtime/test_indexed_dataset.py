@@ -0,0 +1,155 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import os
+import numpy as np
+import pytest
+from multiprocessing import Process
+
+from deepspeed.runtime.data_pipeline.data_sampling.indexed_dataset import (
+    MMapIndexedDataset, MMapIndexedDatasetBuilder, CompressedMMapIndexedDataset, CompressedMMapIndexedDatasetBuilder,
+    infer_dataset_impl, make_dataset, MMapIndexedDatasetShardedBuilder)
+
+
+def build_dataset(path, sizes, dtype=np.uint16, seed=0):
+    rng = np.random.RandomState(seed)
+    items = [rng.randint(0, 1000, size=size).astype(dtype) for size in sizes]
+    builder = MMapIndexedDatasetBuilder(f"{path}.bin", dtype=dtype)
+    for item in items:
+        builder.add_item_numpy(item)
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    return MMapIndexedDataset(path, skip_warmup=True), items
+
+
+# short items take the vectorized gather, long items the per-item copy
+@pytest.mark.parametrize("max_size", [16, 5000])
+def test_get_batch(tmpdir, max_size):
+    sizes = np.random.RandomState(1).randint(0, max_size, size=100)
+    dataset, items = build_dataset(f"{tmpdir}/data", sizes)
+    indices = np.random.RandomState(2).randint(0, len(items), size=40)
+
+    flat, offsets = dataset.get_batch(indices)
+    assert flat.dtype == np.uint16
+    assert len(offsets) == len(indices) + 1
+    for i, idx in enumerate(indices):
+        assert np.array_equal(flat[offsets[i]:offsets[i + 1]], items[idx])
+
+    flat, offsets = dataset.get_batch([])
+    assert len(flat) == 0 and offsets.tolist() == [0]
+
+
+@pytest.mark.parametrize("drop_last", [False, True])
+def test_get_packed_blocks(tmpdir, drop_last):
+    dataset, items = build_dataset(f"{tmpdir}/data", [5, 3, 9, 0, 4])
+    indices = [4, 0, 2, 3, 1]
+    tokens = np.concatenate([items[i] for i in indices])
+
+    blocks, offsets = dataset.get_packed_blocks(indices, block_length=8, pad_value=7, drop_last=drop_last)
+    num_blocks = 2 if drop_last else 3
+    assert blocks.shape == (num_blocks, 8)
+    assert np.array_equal(blocks.reshape(-1)[:min(len(tokens), num_blocks * 8)], tokens[:num_blocks * 8])
+    if not drop_last:
+        assert np.all(blocks.reshape(-1)[len(tokens):] == 7)
+    for i, idx in enumerate(indices):
+        assert np.array_equal(tokens[offsets[i]:offsets[i + 1]], items[idx])
+
+
+@pytest.mark.parametrize("codec", ["bitpack", "delta", "zlib"])
+@pytest.mark.parametrize("dtype", [np.uint16, np.int64])
+def test_compressed_dataset(tmpdir, codec, dtype):
+    rng = np.random.RandomState(0)
+    items = [rng.randint(0, 5000, size=size).astype(dtype) for size in rng.randint(0, 300, size=200)]
+    items[3] = np.sort(items[3])
+    path = f"{tmpdir}/data"
+    builder = CompressedMMapIndexedDatasetBuilder(f"{path}.bin", dtype=dtype, codec=codec, block_size=256)
+    for i, item in enumerate(items):
+        builder.add_item_numpy(item)
+        if i % 50 == 49:
+            builder.end_document()
+    builder.finalize(f"{path}.idx")
+
+    assert infer_dataset_impl(path) == 'compressed_mmap'
+    dataset = make_dataset(path, 'compressed_mmap')
+    assert len(dataset) == len(items)
+    assert dataset.dtype == dtype
+    assert dataset.doc_idx.tolist() == [0, 50, 100, 150, 200]
+    assert np.array_equal(dataset.sizes, [len(item) for item in items])
+    # random access in both directions goes through the block cache
+    for idx in list(range(len(items))) + list(reversed(range(len(items)))):
+        assert np.array_equal(dataset[idx], items[idx])
+    assert np.array_equal(dataset.get(3, offset=2, length=5), items[3][2:7])
+    for expected, actual in zip(items[10:20], dataset[10:20]):
+        assert np.array_equal(expected, actual)
+    assert len(dataset._block_cache) <= dataset._cache_blocks
+
+
+def test_compressed_dataset_ratio(tmpdir):
+    # sorted sample ids, as written to index_to_sample by the DataAnalyzer
+    sample_ids = np.sort(np.random.RandomState(0).choice(10**7, size=100000, replace=False)).astype(np.int64)
+    path = f"{tmpdir}/data"
+    builder = CompressedMMapIndexedDatasetBuilder(f"{path}.bin", dtype=np.int64, codec='delta')
+    builder.add_item_numpy(sample_ids)
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    assert os.path.getsize(f"{path}.bin") * 4 < sample_ids.nbytes
+    assert np.array_equal(CompressedMMapIndexedDataset(path)[0], sample_ids)
+
+
+def test_compressed_dataset_raw_blocks(tmpdir):
+    # ids using the full uint16 range do not pack and are stored as is
+    tokens = np.random.RandomState(0).randint(0, 65536, size=1000).astype(np.uint16)
+    path = f"{tmpdir}/data"
+    builder = CompressedMMapIndexedDatasetBuilder(f"{path}.bin", dtype=np.uint16, block_size=256)
+    builder.add_items_numpy(tokens, [400, 600])
+    builder.end_document()
+    builder.finalize(f"{path}.idx")
+    assert os.path.getsize(f"{path}.bin") == tokens.nbytes
+    dataset = CompressedMMapIndexedDataset(path)
+    assert np.array_equal(dataset[0], tokens[:400]) and np.array_equal(dataset[1], tokens[400:])
+
+
+def write_shard(sharded_builder, shard_id, items):
+    builder = sharded_builder.shard_builder(shard_id)
+    for i, item in enumerate(items):
+        builder.add_item_numpy(item)
+        if i % 3 == 2:
+            builder.end_document()
+    sharded_builder.finalize_shard(builder, shard_id)
+
+
+def test_sharded_builder(tmpdir):
+    rng = np.random.RandomState(0)
+    shards = [[rng.randint(0, 1000, size=size).astype(np.int32) for size in rng.randint(0, 50, size=num_items)]
+              for num_items in [10, 0, 7, 25]]
+    sharded_builder = MMapIndexedDatasetShardedBuilder(f"{tmpdir}/merged", num_shards=len(shards), dtype=np.int32)
+    processes = [
+        Process(target=write_shard, args=(sharded_builder, shard_id, items)) for shard_id, items in enumerate(shards)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+    sharded_builder.merge(num_threads=3)
+
+    # same files as a sequential merge_file_
+    builder = MMapIndexedDatasetBuilder(f"{tmpdir}/sequential.bin", dtype=np.int32)
+    for shard_id in range(len(shards)):
+        builder.merge_file_(sharded_builder.shard_prefix(shard_id))
+    builder.finalize(f"{tmpdir}/sequential.idx")
+    for suffix in [".bin", ".idx"]:
+        with open(f"{tmpdir}/merged{suffix}", "rb") as merged, open(f"{tmpdir}/sequential{suffix}", "rb") as expected:
+            assert merged.read() == expected.read()
+
+    dataset = MMapIndexedDataset(f"{tmpdir}/merged", skip_warmup=True)
+    items = [item for shard in shards for item in shard]
+    assert len(dataset) == len(items)
+    for idx, item in enumerate(items):
+        assert np.array_equal(dataset[idx], item)
+    assert not [f for f in os.listdir(tmpdir) if f.endswith(".tmp")]
+
+    sharded_builder.merge(remove_shards=True)
+    assert not os.path.exists(f"{sharded_builder.shard_prefix(0)}.bin")
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# SPDX-License-Identifier: Apache-2.0
+
+# DeepSpeed Team
+
+import torch
+from deepspeed.runtime.swap_tensor.param_host_cache import PartitionedParamHostCache
+from deepspeed.runtime.zero.config import DeepSpeedZeroConfig
+
+
+def test_host_cache_config():
+    config = DeepSpeedZeroConfig(**{"offload_param": {"device": "nvme", "host_cache_size": 1000}})
+    assert config.offload_param.host_cache_size == 1000
+
+    config = DeepSpeedZeroConfig(**{"offload_param": {"device": "nvme"}})
+    assert config.offload_param.host_cache_size == 0
+
+
+def test_host_cache_hit_and_miss():
+    cache = PartitionedParamHostCache(max_numel=8, dtype=torch.float16)
+    assert cache.lookup(0, 4) is None
+
+    cache.insert(0, torch.ones(4, dtype=torch.float16))
+    cached = cache.lookup(0, 4)
+    assert torch.equal(cached, torch.ones(4, dtype=torch.float16))
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+    assert stats['bytes_from_disk'] == 4 * 2
+    assert stats['bytes_from_cache'] == 4 * 2
+
+
+def test_host_cache_write_through():
+    cache = PartitionedParamHostCache(max_numel=8, dtype=torch.float32)
+    cache.insert(0, torch.zeros(4))
+    cache.update(0, torch.full((4, ), 3.0))
+    assert torch.equal(cache.lookup(0, 4), torch.full((4, ), 3.0))
+
+    # updates of non resident params are ignored
+    cache.update(1, torch.ones(4))
+    assert not cache.contains(1)
+
+
+def test_host_cache_lru_eviction():
+    cache = PartitionedParamHostCache(max_numel=8, dtype=torch.float32)
+    cache.insert(0, torch.zeros(4))
+    cache.insert(1, torch.zeros(4))
+    cache.lookup(0, 4)
+    cache.insert(2, torch.zeros(4))
+
+    assert cache.contains(0) and cache.contains(2)
+    assert not cache.contains(1)
+    assert cache.cached_numel == 8
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_host_cache_trace_eviction():
+    cache = PartitionedParamHostCache(max_numel=8, dtype=torch.float32)
+    # forward uses params 0, 1, 2 at steps 0, 1, 2, backward in reverse order at steps 3, 4, 5
+    trace = [(0, 0), (1, 1), (2, 2), (2, 3), (1, 4), (0, 5)]
+    cache.set_access_trace(owner=0, param_steps=trace, trace_length=6)
+
+    cache.set_trace_step(owner=0, step_id=0)
+    cache.insert(0, torch.zeros(4))
+    cache.set_trace_step(owner=0, step_id=1)
+    cache.insert(1, torch.zeros(4))
+
+    # at step 2, param 0 is reused last (step 5), so it makes room for param 2 (reused at step 3)
+    cache.set_trace_step(owner=0, step_id=2)
+    assert cache.insert(2, torch.zeros(4))
+    assert cache.contains(1) and cache.contains(2)
+    assert not cache.contains(0)
+
+    # param 0 is reused after everything resident, so it is not admitted
+    assert not cache.insert(0, torch.zeros(4))
+    assert not cache.contains(0)
+
+
+def test_host_cache_oversized_entry():
+    cache = PartitionedParamHostCache(max_numel=4, dtype=torch.float32)
+    assert not cache.insert(0, torch.zeros(8))
+    assert cache.cached_numel == 0